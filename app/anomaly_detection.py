@@ -0,0 +1,248 @@
+import json
+import logging
+import warnings
+import numpy as np
+import pandas as pd
+from app.db_schema import KATEGORIEN
+
+# Schwellenwerte der Plausibilitätsprüfung
+ROLLING_WINDOW = 10
+MIN_HISTORY = 3
+Z_THRESHOLD = 3.0
+JUMP_THRESHOLD = 40.0
+
+PUNKTE_SPALTEN = [f"{k}_{art}_punkte" for k in KATEGORIEN for art in ("erreichte", "max")]
+REIHEN = KATEGORIEN + ["gesamt"]
+
+# Anzeigetexte der Prüfungen
+PRUEFUNGEN = {
+    "punkte_ueber_maximum": "Erreichte Punkte über dem Maximum",
+    "ausreisser": "Starke Abweichung vom bisherigen Verlauf",
+    "sprung": f"Sprung im Gesamtergebnis um mindestens {JUMP_THRESHOLD:.0f} Prozentpunkte",
+    "duplikat": "Identische Punkte wie ein früherer Test",
+}
+
+# Spalten der Historienabfrage (Reihenfolge entspricht den numpy-Arrays)
+_HISTORY_COLUMNS = ["test_id", "test_datum"] + PUNKTE_SPALTEN + ["gesamt_prozent"]
+
+
+def init_review_queue(conn):
+    """
+    Legt die Prüfliste für auffällige Tests und den Index für die Historienabfrage an.
+    Einträge gelöschter Tests werden per Trigger entfernt.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS test_review_queue (
+            review_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            test_id INTEGER NOT NULL,
+            pruefung TEXT NOT NULL,
+            details TEXT,
+            status TEXT NOT NULL DEFAULT 'offen',
+            erstellt_am TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_review_queue_test_id ON test_review_queue (test_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_review_queue_status ON test_review_queue (status)')
+    # Rollierendes Fenster: die letzten Tests eines Teilnehmers nach Datum, direkt aus dem Index
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tests_teilnehmer_datum ON tests (teilnehmer_id, test_datum)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tests_delete_review
+        AFTER DELETE ON tests
+        BEGIN
+            DELETE FROM test_review_queue WHERE test_id = OLD.test_id;
+        END
+    ''')
+    conn.commit()
+
+
+def _percentages(erreicht, maximal, gesamt):
+    """
+    Prozentwerte je Kategorie und gesamt als Matrix (Zeilen = Tests, Spalten = REIHEN).
+    Kategorien ohne Maximalpunkte ergeben NaN.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kategorien = np.where(maximal > 0, erreicht / maximal * 100, np.nan)
+    return np.column_stack([kategorien, gesamt])
+
+
+def evaluate(points, gesamt, window_mean, window_std, window_count, previous_total, duplicate):
+    """
+    Wertet die Prüfregeln für mehrere Tests auf einmal aus.
+    Args:
+        points (numpy.ndarray): Punkte je Test in der Reihenfolge PUNKTE_SPALTEN (n x 12).
+        gesamt (numpy.ndarray): 'gesamt_prozent' je Test (n).
+        window_mean (numpy.ndarray): Mittelwert der Prozentwerte im Fenster vorheriger Tests (n x 7).
+        window_std (numpy.ndarray): Standardabweichung im Fenster (n x 7).
+        window_count (numpy.ndarray): Anzahl vorheriger Tests im Fenster (n).
+        previous_total (numpy.ndarray): 'gesamt_prozent' des direkt vorherigen Tests, NaN ohne Vorgänger (n).
+        duplicate (numpy.ndarray): True, wenn die Punkte einem Test im Fenster gleichen (n).
+    Returns:
+        list: Je Test eine Liste von Befunden (Prüfung, Details).
+    """
+    erreicht, maximal = points[:, 0::2], points[:, 1::2]
+    over_max = erreicht > maximal
+
+    values = _percentages(erreicht, maximal, gesamt)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (values - window_mean) / window_std
+    outlier = (np.abs(z) > Z_THRESHOLD) & (window_count >= MIN_HISTORY)[:, None]
+    jump = np.abs(gesamt - previous_total) >= JUMP_THRESHOLD
+
+    findings = [[] for _ in range(len(points))]
+    for i in np.flatnonzero(over_max.any(axis=1) | outlier.any(axis=1) | jump | duplicate):
+        if over_max[i].any():
+            findings[i].append(("punkte_ueber_maximum", {
+                KATEGORIEN[k]: [float(erreicht[i, k]), float(maximal[i, k])] for k in np.flatnonzero(over_max[i])
+            }))
+        if outlier[i].any():
+            findings[i].append(("ausreisser", {
+                REIHEN[k]: round(float(z[i, k]), 2) for k in np.flatnonzero(outlier[i])
+            }))
+        if jump[i]:
+            findings[i].append(("sprung", {"vorher": round(float(previous_total[i]), 1),
+                                           "jetzt": round(float(gesamt[i]), 1)}))
+        if duplicate[i]:
+            findings[i].append(("duplikat", {}))
+    return findings
+
+
+def _window_stats(history_values):
+    """
+    Mittelwert und Standardabweichung der Prozentwerte je Reihe über das Fenster (NaN-tolerant).
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(history_values, axis=0), np.nanstd(history_values, axis=0, ddof=1)
+
+
+def check_test(conn, test_id, teilnehmer_id, test_datum, points, gesamt_prozent):
+    """
+    Prüft einen einzelnen Test gegen das Fenster der vorherigen Tests des Teilnehmers.
+    Die Historie wird über den Index (teilnehmer_id, test_datum) gelesen; die Auswertung läuft
+    ohne pandas direkt auf numpy-Arrays, damit die Prüfung je Einfügung unter einer Millisekunde bleibt.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung (innerhalb der Schreibtransaktion).
+        test_id (int): ID des geprüften Tests (wird aus der Historie ausgeschlossen).
+        teilnehmer_id (int): ID des Teilnehmers.
+        test_datum (str): Testdatum 'YYYY-MM-DD'.
+        points (list): Punkte in der Reihenfolge PUNKTE_SPALTEN.
+        gesamt_prozent (float): Gesamtprozent des Tests.
+    Returns:
+        list: Befunde (Prüfung, Details).
+    """
+    rows = conn.execute(f'''
+        SELECT {", ".join(PUNKTE_SPALTEN)}, gesamt_prozent
+        FROM tests
+        WHERE teilnehmer_id = ? AND test_datum <= ? AND test_id != ?
+        ORDER BY test_datum DESC, test_id DESC
+        LIMIT ?
+    ''', (int(teilnehmer_id), str(test_datum), int(test_id), ROLLING_WINDOW)).fetchall()
+
+    points = np.asarray([points], dtype="float64")
+    gesamt = np.asarray([gesamt_prozent], dtype="float64")
+    history = np.asarray(rows, dtype="float64").reshape(len(rows), len(PUNKTE_SPALTEN) + 1)
+    history_values = _percentages(history[:, 0:-1:2], history[:, 1:-1:2], history[:, -1])
+    mean, std = _window_stats(history_values)
+    duplicate = bool(len(rows)) and bool(np.isclose(history[:, :-1], points).all(axis=1).any())
+    previous_total = history[0, -1] if len(rows) else np.nan
+
+    return evaluate(points, gesamt, mean[None, :], std[None, :], np.asarray([len(rows)]),
+                    np.asarray([previous_total]), np.asarray([duplicate]))[0]
+
+
+def check_tests(conn, test_ids):
+    """
+    Prüft viele Tests auf einmal (z. B. nach einem Massenimport). Die Historie aller betroffenen
+    Teilnehmer wird mit einer Abfrage gelesen; Fensterstatistiken werden vektorisiert mit
+    gruppierten, rollierenden Fenstern über die jeweils vorherigen Tests berechnet.
+    Die IDs werden in einer temporären Tabelle der Verbindung abgelegt; der Aufrufer muss daher
+    die Schreibsperre des Standorts halten (siehe `site_router.write_lock`).
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung (innerhalb der Schreibtransaktion).
+        test_ids (list): IDs der zu prüfenden Tests.
+    Returns:
+        dict: test_id -> Liste von Befunden (nur Tests mit Befund).
+    """
+    if not test_ids:
+        return {}
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS anomaly_check_ids (test_id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM anomaly_check_ids")
+    conn.executemany("INSERT OR IGNORE INTO anomaly_check_ids VALUES (?)", [(int(i),) for i in test_ids])
+    history = pd.read_sql_query(f'''
+        SELECT teilnehmer_id, {", ".join(_HISTORY_COLUMNS)}
+        FROM tests
+        WHERE teilnehmer_id IN (
+            SELECT DISTINCT t.teilnehmer_id FROM tests t JOIN anomaly_check_ids c ON c.test_id = t.test_id
+        )
+        ORDER BY teilnehmer_id, test_datum, test_id
+    ''', conn)
+    conn.execute("DELETE FROM anomaly_check_ids")
+
+    key = history["teilnehmer_id"].to_numpy()
+    points = history[PUNKTE_SPALTEN].to_numpy(dtype="float64")
+    gesamt = history["gesamt_prozent"].to_numpy(dtype="float64")
+    values = pd.DataFrame(_percentages(points[:, 0::2], points[:, 1::2], gesamt), columns=REIHEN)
+
+    # Fenster über die vorherigen Tests: erst je Teilnehmer verschieben, dann rollierend aggregieren
+    previous = values.groupby(key).shift(1)
+    rolling = previous.groupby(key).rolling(ROLLING_WINDOW, min_periods=1)
+    mean = rolling.mean().reset_index(level=0, drop=True).sort_index().to_numpy()
+    std = rolling.std().reset_index(level=0, drop=True).sort_index().to_numpy()
+    position = history.groupby(key).cumcount().to_numpy()
+    count = np.minimum(position, ROLLING_WINDOW)
+
+    # Duplikat: gleiche Punkte wie einer der vorherigen Tests im Fenster (mit Toleranz, da
+    # Gleitkommawerte aus Formularen und Importen leicht abweichen können)
+    point_frame = history[PUNKTE_SPALTEN]
+    duplicate = np.zeros(len(history), dtype=bool)
+    for lag in range(1, ROLLING_WINDOW + 1):
+        duplicate |= np.isclose(point_frame.groupby(key).shift(lag).to_numpy(), points).all(axis=1)
+
+    selected = history["test_id"].isin(test_ids).to_numpy()
+    findings = evaluate(points[selected], gesamt[selected], mean[selected], std[selected], count[selected],
+                        previous["gesamt"].to_numpy()[selected], duplicate[selected])
+    return {int(test_id): f for test_id, f in zip(history.loc[selected, "test_id"], findings) if f}
+
+
+def record_findings(conn, findings_by_test):
+    """
+    Schreibt Befunde in die Prüfliste (ohne Commit, Teil der Schreibtransaktion des Aufrufers).
+    Offene Einträge zu denselben Tests werden vorher ersetzt, damit eine korrigierte Eingabe
+    keine veralteten Befunde hinterlässt.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        findings_by_test (dict): test_id -> Liste von Befunden.
+    Returns:
+        int: Anzahl geschriebener Einträge.
+    """
+    conn.executemany("DELETE FROM test_review_queue WHERE test_id = ? AND status = 'offen'",
+                     [(int(test_id),) for test_id in findings_by_test])
+    rows = [(int(test_id), pruefung, json.dumps(details, ensure_ascii=False))
+            for test_id, findings in findings_by_test.items() for pruefung, details in findings]
+    conn.executemany("INSERT INTO test_review_queue (test_id, pruefung, details) VALUES (?, ?, ?)", rows)
+    if rows:
+        logging.warning(f"{len(rows)} Auffälligkeiten in {sum(1 for f in findings_by_test.values() if f)} "
+                        f"Tests zur Prüfung vorgemerkt.")
+    return len(rows)
+
+
+def get_review_queue(conn, status="offen"):
+    """
+    Ruft die Einträge der Prüfliste mit Teilnehmer und Testdatum ab.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        status (str): 'offen' oder 'geprüft'; None liefert alle Einträge.
+    Returns:
+        pandas.DataFrame: Einträge, die neuesten zuerst.
+    """
+    return pd.read_sql_query('''
+        SELECT q.review_id, q.test_id, t.teilnehmer_id, p.name, t.test_datum, q.pruefung, q.details,
+               q.status, q.erstellt_am
+        FROM test_review_queue q
+        JOIN tests t ON t.test_id = q.test_id
+        JOIN teilnehmer p ON p.teilnehmer_id = t.teilnehmer_id
+        WHERE ? IS NULL OR q.status = ?
+        ORDER BY q.review_id DESC
+    ''', conn, params=(status, status))
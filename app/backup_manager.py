@@ -0,0 +1,239 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Standardwerte für Sicherungen
+BACKUP_DIR = Path("backups")
+BACKUP_PAGES_PER_STEP = 256          # Seiten je Schritt beim Wiederherstellen und beim Schreiben auf die Festplatte
+BACKUP_SLEEP_SECONDS = 0.005         # Pause zwischen zwei Schritten beim Wiederherstellen
+BACKUP_INTERVAL_SECONDS = 60 * 60    # Zeitplan: stündlich
+BACKUP_RETENTION = 24                # Anzahl aufbewahrter Sicherungen
+
+# Ein einzelner Hintergrund-Thread für die Komprimierung, damit Anfragen nicht warten müssen
+_compression_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup-compress")
+
+
+def _log_progress(status, remaining, total):
+    """
+    Fortschrittsmeldung für `sqlite3.Connection.backup`.
+    """
+    if remaining == 0 or status != sqlite3.SQLITE_OK:
+        logging.info(f"Backup-Schritt abgeschlossen: {total - remaining}/{total} Seiten kopiert.")
+
+
+def create_backup(source_conn, backup_dir=BACKUP_DIR, compress=False):
+    """
+    Erstellt eine konsistente Sicherung der Datenbank mit der SQLite-Backup-API.
+    Zuerst wird in einem einzigen Schritt eine Momentaufnahme in eine private In-Memory-Datenbank
+    kopiert; Schreiber warten nur für diese Speicherkopie. Ein schrittweises Kopieren aus der
+    laufenden Datenbank würde bei jedem Commit einer anderen Verbindung neu beginnen und unter
+    Dauerlast nie fertig. Die Momentaufnahme wird danach ohne Einfluss auf andere Verbindungen
+    auf die Festplatte geschrieben, unter einem temporären Namen und erst nach Abschluss umbenannt.
+    Der Speicherbedarf steigt während der Sicherung um die Größe der Datenbank.
+    Args:
+        source_conn (sqlite3.Connection): Eigene Verbindung zur zu sichernden Datenbank, die nur
+            festgeschriebene Daten sieht (nicht die gemeinsame Schreibverbindung).
+        backup_dir (str | Path): Zielverzeichnis.
+        compress (bool): Sicherung anschließend im Hintergrund mit gzip komprimieren.
+    Returns:
+        Path: Pfad der erstellten (noch unkomprimierten) Sicherung.
+    """
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    target = backup_dir / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.db"
+    tmp_target = target.with_suffix(".db.part")
+
+    try:
+        snapshot = sqlite3.connect(":memory:")
+        try:
+            source_conn.backup(snapshot)
+            dest_conn = sqlite3.connect(tmp_target)
+            try:
+                snapshot.backup(dest_conn, pages=BACKUP_PAGES_PER_STEP, progress=_log_progress)
+            finally:
+                dest_conn.close()
+        finally:
+            snapshot.close()
+        os.replace(tmp_target, target)
+        logging.info(f"Sicherung '{target}' erfolgreich erstellt.")
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Fehler beim Erstellen der Sicherung: {e}")
+        if tmp_target.exists():
+            tmp_target.unlink()
+        raise e
+
+    if compress:
+        _compression_executor.submit(compress_backup, target)
+    return target
+
+
+def compress_backup(path):
+    """
+    Komprimiert eine Sicherung mit gzip und entfernt anschließend die unkomprimierte Datei.
+    Args:
+        path (str | Path): Pfad der Sicherung.
+    Returns:
+        Path | None: Pfad der komprimierten Datei oder None, wenn die Sicherung nicht mehr existiert.
+    """
+    path = Path(path)
+    target = path.with_name(path.name + ".gz")
+    tmp_target = target.with_name(target.name + ".part")
+    try:
+        with open(path, "rb") as src, gzip.open(tmp_target, "wb") as dst:
+            shutil.copyfileobj(src, dst, length=1024 * 1024)
+        os.replace(tmp_target, target)
+        path.unlink()
+        logging.info(f"Sicherung '{path}' nach '{target}' komprimiert.")
+        return target
+    except FileNotFoundError:
+        # Sicherung wurde zwischenzeitlich durch die Rotation entfernt
+        if tmp_target.exists():
+            tmp_target.unlink()
+        return None
+    except OSError as e:
+        logging.error(f"Fehler beim Komprimieren der Sicherung '{path}': {e}")
+        if tmp_target.exists():
+            tmp_target.unlink()
+        return None
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """
+    Listet alle vollständigen Sicherungen auf, die neueste zuerst.
+    Args:
+        backup_dir (str | Path): Sicherungsverzeichnis.
+    Returns:
+        list[Path]: Pfade der Sicherungen (`.db` und `.db.gz`).
+    """
+    backup_dir = Path(backup_dir)
+    if not backup_dir.exists():
+        return []
+    backups = [p for p in backup_dir.glob("backup_*") if p.name.endswith((".db", ".db.gz"))]
+    return sorted(backups, key=lambda p: p.name, reverse=True)
+
+
+def rotate_backups(backup_dir=BACKUP_DIR, keep=BACKUP_RETENTION):
+    """
+    Löscht alle Sicherungen bis auf die `keep` neuesten.
+    Args:
+        backup_dir (str | Path): Sicherungsverzeichnis.
+        keep (int): Anzahl der aufzubewahrenden Sicherungen.
+    Returns:
+        list[Path]: Gelöschte Sicherungen.
+    """
+    removed = []
+    seen = set()
+    for path in list_backups(backup_dir):
+        # Eine Sicherung kann während der Komprimierung kurzzeitig als .db und .db.gz vorliegen
+        stem = path.name.split(".")[0]
+        if stem in seen or len(seen) < keep:
+            seen.add(stem)
+            continue
+        try:
+            path.unlink()
+            removed.append(path)
+        except FileNotFoundError:
+            pass
+    if removed:
+        logging.info(f"{len(removed)} alte Sicherungen entfernt.")
+    return removed
+
+
+def _table_counts(conn):
+    """
+    Zählt die Zeilen aller Benutzertabellen einer Datenbank.
+    """
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def _check_integrity(conn, label):
+    """
+    Führt `PRAGMA integrity_check` aus und wirft einen Fehler, wenn die Datenbank beschädigt ist.
+    """
+    result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"Integritätsprüfung für {label} fehlgeschlagen: {result}")
+
+
+def restore_backup(path, target_conn):
+    """
+    Stellt eine Sicherung in die Zieldatenbank wieder her und überprüft das Ergebnis.
+    Vor dem Einspielen wird die Sicherung auf Integrität geprüft; danach werden Integrität
+    und Zeilenzahlen aller Tabellen der Zieldatenbank mit der Sicherung verglichen.
+    Args:
+        path (str | Path): Pfad der Sicherung (`.db` oder `.db.gz`).
+        target_conn (sqlite3.Connection): Verbindung zur wiederherzustellenden Datenbank.
+    Returns:
+        dict: Zeilenzahlen je Tabelle nach der Wiederherstellung.
+    """
+    path = Path(path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_path = path
+        if path.name.endswith(".gz"):
+            source_path = Path(tmp_dir) / path.name[:-3]
+            with gzip.open(path, "rb") as src, open(source_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)
+
+        source_conn = sqlite3.connect(source_path)
+        try:
+            _check_integrity(source_conn, f"Sicherung '{path}'")
+            expected_counts = _table_counts(source_conn)
+            source_conn.backup(target_conn, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_SLEEP_SECONDS)
+        except sqlite3.Error as e:
+            logging.error(f"Fehler beim Wiederherstellen der Sicherung '{path}': {e}")
+            raise e
+        finally:
+            source_conn.close()
+
+    _check_integrity(target_conn, "die wiederhergestellte Datenbank")
+    restored_counts = _table_counts(target_conn)
+    if restored_counts != expected_counts:
+        raise sqlite3.DatabaseError(
+            f"Wiederherstellung unvollständig: erwartet {expected_counts}, vorgefunden {restored_counts}"
+        )
+    logging.info(f"Sicherung '{path}' erfolgreich wiederhergestellt: {restored_counts}")
+    return restored_counts
+
+
+def start_backup_scheduler(get_connection, interval_seconds=BACKUP_INTERVAL_SECONDS,
+                           backup_dir=BACKUP_DIR, keep=BACKUP_RETENTION, compress=True):
+    """
+    Startet einen Hintergrund-Thread, der in festen Abständen Sicherungen erstellt und rotiert.
+    Args:
+        get_connection (callable): Öffnet eine eigene Verbindung zur zu sichernden Datenbank;
+            sie wird nach der Sicherung geschlossen.
+        interval_seconds (int): Abstand zwischen zwei Sicherungen.
+        backup_dir (str | Path): Sicherungsverzeichnis.
+        keep (int): Anzahl der aufzubewahrenden Sicherungen.
+        compress (bool): Sicherungen im Hintergrund komprimieren.
+    Returns:
+        threading.Event: Setzen des Events beendet den Zeitplan.
+    """
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.wait(interval_seconds):
+            try:
+                conn = get_connection()
+                try:
+                    create_backup(conn, backup_dir, compress=compress)
+                finally:
+                    conn.close()
+                rotate_backups(backup_dir, keep)
+            except (OSError, sqlite3.Error) as e:
+                # Fehler sind bereits protokolliert; der nächste Lauf versucht es erneut
+                logging.error(f"Geplante Sicherung fehlgeschlagen: {e}")
+
+    threading.Thread(target=run, name="backup-scheduler", daemon=True).start()
+    logging.info(f"Sicherungszeitplan gestartet (alle {interval_seconds} Sekunden, {keep} Sicherungen).")
+    return stop_event
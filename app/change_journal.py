@@ -0,0 +1,248 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+from app.db_schema import TABLE_SCHEMAS
+
+# Primärschlüssel der überwachten Tabellen
+PRIMARY_KEYS = {
+    "teilnehmer": "teilnehmer_id",
+    "tests": "test_id",
+}
+# Basisverzeichnis für Delta-Exporte aus der Anwendung
+EXPORT_DIR = Path("exports")
+# Journaleintrag, der eine Wiederherstellung aus einer Sicherung markiert
+RESTORE_TABLE = "datenbank"
+RESTORE_OPERATION = "RESTORE"
+
+
+def _json_row(table, prefix):
+    """
+    Baut einen `json_object(...)`-Ausdruck über alle Spalten einer Tabelle für einen Trigger.
+    Args:
+        table (str): Tabellenname.
+        prefix (str): 'NEW' oder 'OLD'.
+    Returns:
+        str: SQL-Ausdruck.
+    """
+    return "json_object(" + ", ".join(f"'{col}', {prefix}.{col}" for col in TABLE_SCHEMAS[table]) + ")"
+
+
+def init_change_journal(conn):
+    """
+    Legt das Änderungsjournal, die Export-Checkpoints und die Trigger an, die jede
+    Einfügung, Änderung und Löschung in 'teilnehmer' und 'tests' protokollieren.
+    Die Sequenznummer (AUTOINCREMENT) steigt streng monoton und wird nie wiederverwendet.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_data TEXT,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS export_checkpoints (
+            sink TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            exported_at TEXT NOT NULL
+        )
+    ''')
+
+    for table, pk in PRIMARY_KEYS.items():
+        for operation, prefix in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_journal
+                AFTER {operation} ON {table}
+                BEGIN
+                    INSERT INTO change_journal (table_name, operation, row_id, row_data)
+                    VALUES ('{table}', '{operation}', {prefix}.{pk}, {_json_row(table, prefix)});
+                END
+            ''')
+    conn.commit()
+    logging.info("Änderungsjournal erfolgreich initialisiert.")
+
+
+def get_changes(conn, since_seq=0, limit=None):
+    """
+    Ruft die Journaleinträge nach einer Sequenznummer ab (Audit-Trail).
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        since_seq (int): Nur Einträge mit größerer Sequenznummer werden geliefert.
+        limit (int): Nur die neuesten `limit` Einträge liefern (optional).
+    Returns:
+        pandas.DataFrame: Journaleinträge in Reihenfolge der Sequenznummer.
+    """
+    if limit is None:
+        query = "SELECT * FROM change_journal WHERE seq > ? ORDER BY seq"
+        return pd.read_sql_query(query, conn, params=(int(since_seq),))
+    # Die neuesten Einträge über den Primärschlüssel holen und wieder aufsteigend sortieren
+    query = '''
+        SELECT * FROM (SELECT * FROM change_journal WHERE seq > ? ORDER BY seq DESC LIMIT ?)
+        ORDER BY seq
+    '''
+    return pd.read_sql_query(query, conn, params=(int(since_seq), int(limit)))
+
+
+def journal_sequence(conn):
+    """
+    Gibt die zuletzt vergebene Sequenznummer des Journals zurück (auch wenn der Eintrag gelöscht wurde).
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").fetchone()
+    return row[0] if row else 0
+
+
+def record_restore(conn, min_seq):
+    """
+    Vermerkt eine Wiederherstellung im Journal (ohne Commit).
+    Die Sicherung bringt ein älteres Journal samt Sequenzzähler mit; der Zähler wird daher mindestens
+    auf den Stand vor der Wiederherstellung gesetzt, damit keine bereits exportierten Sequenznummern
+    erneut vergeben werden. Exporte über den Marker hinweg liefern einen vollständigen Snapshot.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        min_seq (int): Zuletzt vergebene Sequenznummer vor der Wiederherstellung.
+    Returns:
+        int: Sequenznummer des Markers.
+    """
+    if conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'change_journal'",
+                    (int(min_seq),)).rowcount == 0:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_journal', ?)", (int(min_seq),))
+    cursor = conn.execute("INSERT INTO change_journal (table_name, operation, row_id) VALUES (?, ?, 0)",
+                          (RESTORE_TABLE, RESTORE_OPERATION))
+    logging.info(f"Wiederherstellung im Änderungsjournal vermerkt (Sequenz {cursor.lastrowid}).")
+    return cursor.lastrowid
+
+
+def last_restore(conn, after_seq=0):
+    """
+    Gibt die Sequenznummer der letzten Wiederherstellung nach `after_seq` zurück (None, falls keine).
+    """
+    return conn.execute("SELECT MAX(seq) FROM change_journal WHERE operation = ? AND seq > ?",
+                        (RESTORE_OPERATION, int(after_seq))).fetchone()[0]
+
+
+def get_checkpoint(conn, sink):
+    """
+    Gibt die zuletzt exportierte Sequenznummer eines Ziels zurück (0, falls noch nie exportiert).
+    """
+    row = conn.execute("SELECT last_seq FROM export_checkpoints WHERE sink = ?", (str(sink),)).fetchone()
+    return row[0] if row else 0
+
+
+def set_checkpoint(conn, sink, last_seq):
+    """
+    Schreibt die zuletzt verarbeitete Sequenznummer eines Ziels fort (ohne Commit).
+    """
+    conn.execute('''
+        INSERT INTO export_checkpoints (sink, last_seq, exported_at) VALUES (?, ?, ?)
+        ON CONFLICT(sink) DO UPDATE SET last_seq = excluded.last_seq, exported_at = excluded.exported_at
+    ''', (str(sink), last_seq, datetime.now().isoformat(timespec="seconds")))
+
+
+def export_changes(conn, sink_dir):
+    """
+    Exportiert alle seit dem letzten Checkpoint geänderten Zeilen inkrementell in ein Verzeichnis.
+    Je Zeile wird nur der letzte Zustand geliefert (bei Löschungen der gelöschte Zustand).
+    Liegt seit dem Checkpoint eine Wiederherstellung, ist das Delta nicht mehr aussagekräftig; dann wird
+    ein vollständiger Snapshot aller Zeilen ('snapshot_*.jsonl', Operation 'SNAPSHOT') geschrieben,
+    mit dem das Ziel seinen Bestand ersetzt.
+    Die Datei wird erst vollständig geschrieben und dann atomar umbenannt; der Checkpoint
+    wird danach fortgeschrieben, sodass ein abgebrochener Export beim nächsten Lauf wiederholt wird.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        sink_dir (str | Path): Zielverzeichnis für die Delta-Dateien (JSON Lines).
+    Returns:
+        Path | None: Pfad der geschriebenen Delta- bzw. Snapshot-Datei oder None, wenn nichts geändert wurde.
+    """
+    sink_dir = Path(sink_dir)
+    sink_dir.mkdir(parents=True, exist_ok=True)
+    sink = str(sink_dir.resolve())
+
+    last_seq = get_checkpoint(conn, sink)
+    # Obergrenze festhalten, damit gleichzeitige Änderungen im nächsten Lauf landen
+    upper_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_journal").fetchone()[0]
+    if upper_seq <= last_seq:
+        logging.info(f"Keine Änderungen seit Sequenz {last_seq} für '{sink}'.")
+        return None
+
+    if last_restore(conn, last_seq) is not None:
+        changed_at = datetime.now().isoformat(timespec="milliseconds")
+        cursor = conn.execute(" UNION ALL ".join(
+            f"SELECT {upper_seq}, '{table}', 'SNAPSHOT', {pk}, {_json_row(table, table)}, '{changed_at}' FROM {table}"
+            for table, pk in PRIMARY_KEYS.items()
+        ))
+        target = sink_dir / f"snapshot_{upper_seq:012d}.jsonl"
+    else:
+        cursor = conn.execute('''
+            SELECT j.seq, j.table_name, j.operation, j.row_id, j.row_data, j.changed_at
+            FROM change_journal j
+            JOIN (
+                SELECT table_name, row_id, MAX(seq) AS seq
+                FROM change_journal
+                WHERE seq > ? AND seq <= ?
+                GROUP BY table_name, row_id
+            ) latest ON j.seq = latest.seq
+            ORDER BY j.seq
+        ''', (last_seq, upper_seq))
+        target = sink_dir / f"changes_{last_seq + 1:012d}_{upper_seq:012d}.jsonl"
+    tmp_target = target.with_suffix(".jsonl.tmp")
+    try:
+        count = 0
+        with open(tmp_target, "w", encoding="utf-8") as f:
+            for seq, table_name, operation, row_id, row_data, changed_at in cursor:
+                f.write(json.dumps({
+                    "seq": seq,
+                    "table": table_name,
+                    "operation": operation,
+                    "row_id": row_id,
+                    "changed_at": changed_at,
+                    "row": json.loads(row_data) if row_data else None,
+                }, ensure_ascii=False) + "\n")
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_target, target)
+
+        set_checkpoint(conn, sink, upper_seq)
+        conn.commit()
+        logging.info(f"{count} geänderte Zeilen (Sequenz {last_seq + 1}-{upper_seq}) nach '{target}' exportiert.")
+        return target
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Fehler beim inkrementellen Export nach '{sink}': {e}")
+        if tmp_target.exists():
+            tmp_target.unlink()
+        raise e
+
+
+def main():
+    """
+    Kommandozeilenaufruf für den nächtlichen Delta-Export einer dateibasierten Standortdatenbank,
+    z. B. per cron: python -m app.change_journal pfad/zur/db.sqlite exports/standort
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Exportiert die seit dem letzten Lauf geänderten Zeilen.")
+    parser.add_argument("database", help="Pfad der SQLite-Datenbank")
+    parser.add_argument("sink_dir", help="Zielverzeichnis der Delta-Dateien")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        init_change_journal(conn)
+        path = export_changes(conn, args.sink_dir)
+    finally:
+        conn.close()
+    print(path or "Keine Änderungen seit dem letzten Export.")
+
+
+if __name__ == "__main__":
+    main()
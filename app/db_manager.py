@@ -1,34 +1,65 @@
+import re
 import sqlite3
 import pandas as pd
-from pathlib import Path
 import logging
+from contextlib import contextmanager
 import streamlit as st
+from app.db_schema import read_typed, shared_view, TEST_VALUE_COLUMNS
+from app.change_journal import (EXPORT_DIR, init_change_journal, export_changes, get_changes, journal_sequence,
+                                record_restore)
+from app.backup_manager import (BACKUP_DIR, create_backup, list_backups, restore_backup, rotate_backups,
+                                start_backup_scheduler)
+from app.site_router import (connect_site, get_current_site, get_sites, site_slug, federated_cohort_statistics,
+                             read_with_retry, write_lock)
+from app.feature_store import FEATURE_STORE_DIR, feature_store_stamp, load_feature_store, refresh_feature_store
+from app.risk_model import score_cohort, train_risk_classifier
+from app.dedup import (DUPLICATE_THRESHOLD, find_duplicate_candidates, find_duplicates, init_dedup_index,
+                       refresh_blocking_keys)
+from app.anomaly_detection import check_test, check_tests, get_review_queue, init_review_queue, record_findings
 
 # Logging konfigurieren
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Cache-Dekorator für die Datenbankverbindung
+# Copy-on-Write aktivieren, damit gecachte DataFrames gefahrlos geteilt werden können
+pd.set_option("mode.copy_on_write", True)
+
+# Cache-Dekorator für die Datenbankverbindung je Standort
 @st.cache_resource
-def get_db_connection():
+def _connect_site(site):
     """
-    Erstellt und cached eine SQLite-Datenbankverbindung.
+    Erstellt und cached eine SQLite-Datenbankverbindung für einen Standort
+    und initialisiert dessen Datenbank.
     Verwendet `check_same_thread=False`, um Nutzung in mehreren Threads zu ermöglichen.
     """
-    try:
-        conn = sqlite3.connect("file:streamlit_app.db?mode=memory&cache=shared", uri=True, check_same_thread=False)
-        logging.info("Datenbankverbindung erfolgreich hergestellt.")
-        return conn
-    except sqlite3.Error as e:
-        logging.error(f"Fehler beim Herstellen der Datenbankverbindung: {e}")
-        raise e
+    conn = connect_site(site)
+    init_db(conn)
+    return conn
 
-def init_db():
+def get_db_connection(site=None):
+    """
+    Gibt die gecachte Datenbankverbindung eines Standorts zurück.
+    Ohne Angabe wird der in der aktuellen Sitzung gewählte Standort verwendet.
+    """
+    return _connect_site(site or get_current_site())
+
+@contextmanager
+def _write_connection(site=None):
+    """
+    Hält die Schreibsperre eines Standorts und liefert dessen gemeinsame Verbindung.
+    Alle Statements einer Transaktion einschließlich Commit bzw. Rollback laufen innerhalb der Sperre,
+    sodass keine andere Sitzung eine halb geschriebene Transaktion festschreibt oder verwirft.
+    """
+    site = site or get_current_site()
+    with write_lock(site):
+        yield get_db_connection(site)
+
+def init_db(conn=None):
     """
     Initialisiert die SQLite-Datenbank:
     Erstellt die Tabellen 'teilnehmer' und 'tests', falls sie nicht existieren.
     """
     try:
-        conn = get_db_connection()
+        conn = conn or get_db_connection()
         cursor = conn.cursor()
 
         # Tabelle für Teilnehmer
@@ -70,84 +101,541 @@ def init_db():
                 FOREIGN KEY (teilnehmer_id) REFERENCES teilnehmer(teilnehmer_id)
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tests_teilnehmer_id ON tests (teilnehmer_id)')
         conn.commit()
         logging.info("Tabellen erfolgreich initialisiert.")
+
+        # Änderungsjournal (Trigger auf 'teilnehmer' und 'tests')
+        init_change_journal(conn)
+        # Blocking-Schlüssel für die Dublettenprüfung
+        init_dedup_index(conn)
+        # Prüfliste für auffällige Testergebnisse
+        init_review_queue(conn)
     except sqlite3.Error as e:
         logging.error(f"Fehler beim Initialisieren der Datenbank: {e}")
         raise e
-    finally:
-        conn.close()
 
 # CRUD-Funktionen
 def add_teilnehmer(name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status):
     """
     Fügt einen neuen Teilnehmer in die Datenbank ein.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO teilnehmer (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status))
+            conn.commit()
+            _load_teilnehmer.clear()
+            logging.info(f"Teilnehmer {name} erfolgreich hinzugefügt.")
+        except sqlite3.Error as e:
+            logging.error(f"Fehler beim Hinzufügen des Teilnehmers {name}: {e}")
+            raise e
+
+# Die Lade-Funktionen laufen auch in Prefetch-Threads ohne Skriptkontext; daher ohne Spinner
+@st.cache_resource(show_spinner=False)
+def _load_teilnehmer(site):
+    """
+    Lädt alle Teilnehmer eines Standorts getypt und cached den DataFrame sitzungsübergreifend.
+    Wird nach jeder Änderung an der Tabelle 'teilnehmer' invalidiert.
+    """
+    get_db_connection(site)
     try:
-        cursor.execute('''
-            INSERT INTO teilnehmer (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status))
-        conn.commit()
-        logging.info(f"Teilnehmer {name} erfolgreich hinzugefügt.")
-    except sqlite3.Error as e:
-        logging.error(f"Fehler beim Hinzufügen des Teilnehmers {name}: {e}")
+        return read_with_retry(site, lambda conn: read_typed(conn, "teilnehmer", "SELECT * FROM teilnehmer"))
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        logging.error(f"Fehler beim Abrufen der Teilnehmer: {e}")
         raise e
-    finally:
-        conn.close()
 
-def get_all_teilnehmer():
+def get_all_teilnehmer(site=None):
     """
-    Ruft alle Teilnehmer aus der Datenbank ab.
+    Ruft alle Teilnehmer aus der Datenbank ab (Standard: Standort der aktuellen Sitzung).
+    Gibt eine Copy-on-Write-Sicht auf den gecachten, getypten DataFrame zurück
+    (Kategorien für Geschlecht, Status und Berufsbezeichnung, datetime64 für Datumsfelder).
     """
-    conn = get_db_connection()
+    return shared_view(_load_teilnehmer(site or get_current_site()))
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _load_tests(site, teilnehmer_id):
+    """
+    Lädt alle Tests eines Teilnehmers getypt und cached den DataFrame sitzungsübergreifend.
+    """
+    get_db_connection(site)
     try:
-        query = "SELECT * FROM teilnehmer"
-        df = pd.read_sql_query(query, conn)
-        return df
-    except sqlite3.Error as e:
-        logging.error(f"Fehler beim Abrufen der Teilnehmer: {e}")
+        return read_with_retry(site, lambda conn: read_typed(
+            conn, "tests", "SELECT * FROM tests WHERE teilnehmer_id = ?", (int(teilnehmer_id),)))
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        logging.error(f"Fehler beim Abrufen der Tests für Teilnehmer {teilnehmer_id}: {e}")
         raise e
-    finally:
-        conn.close()
 
-def update_teilnehmer(teilnehmer_id, name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status):
+def get_tests_by_teilnehmer(teilnehmer_id, site=None):
     """
-    Aktualisiert die Daten eines vorhandenen Teilnehmers.
+    Ruft alle Tests eines Teilnehmers ab.
+    Gibt eine Copy-on-Write-Sicht auf den gecachten, getypten DataFrame zurück
+    (datetime64 für das Testdatum, Int32 für IDs).
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return shared_view(_load_tests(site or get_current_site(), int(teilnehmer_id)))
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _load_tests_by_beruf(site, berufsbezeichnung):
+    """
+    Lädt alle Tests der Teilnehmer einer Berufsbezeichnung (Kohorte) getypt und cached den DataFrame.
+    """
+    get_db_connection(site)
     try:
-        cursor.execute('''
-            UPDATE teilnehmer
-            SET name = ?, sv_nummer = ?, geschlecht = ?, eintrittsdatum = ?, austrittsdatum = ?, berufsbezeichnung = ?, status = ?
-            WHERE teilnehmer_id = ?
-        ''', (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status, teilnehmer_id))
-        conn.commit()
-        logging.info(f"Teilnehmer {name} erfolgreich aktualisiert.")
-    except sqlite3.Error as e:
-        logging.error(f"Fehler beim Aktualisieren des Teilnehmers {name}: {e}")
+        return read_with_retry(site, lambda conn: read_typed(conn, "tests", '''
+            SELECT tests.* FROM tests
+            JOIN teilnehmer ON teilnehmer.teilnehmer_id = tests.teilnehmer_id
+            WHERE teilnehmer.berufsbezeichnung = ?
+        ''', (berufsbezeichnung,)))
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        logging.error(f"Fehler beim Abrufen der Tests für Berufsbezeichnung {berufsbezeichnung}: {e}")
         raise e
-    finally:
-        conn.close()
+
+def get_tests_by_berufsbezeichnung(berufsbezeichnung, site=None):
+    """
+    Ruft alle Tests der Teilnehmer mit der angegebenen Berufsbezeichnung ab.
+    Gibt eine Copy-on-Write-Sicht auf den gecachten, getypten DataFrame zurück.
+    """
+    return shared_view(_load_tests_by_beruf(site or get_current_site(), str(berufsbezeichnung)))
+
+def update_teilnehmer(teilnehmer_id, name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status):
+    """
+    Aktualisiert die Daten eines vorhandenen Teilnehmers.
+    """
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE teilnehmer
+                SET name = ?, sv_nummer = ?, geschlecht = ?, eintrittsdatum = ?, austrittsdatum = ?, berufsbezeichnung = ?, status = ?
+                WHERE teilnehmer_id = ?
+            ''', (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status, teilnehmer_id))
+            conn.commit()
+            _load_teilnehmer.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Teilnehmer {name} erfolgreich aktualisiert.")
+        except sqlite3.Error as e:
+            logging.error(f"Fehler beim Aktualisieren des Teilnehmers {name}: {e}")
+            raise e
 
 def delete_teilnehmer(teilnehmer_id):
     """
     Löscht einen Teilnehmer aus der Datenbank.
     """
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Tests des Teilnehmers in derselben Transaktion löschen, damit keine verwaisten Tests entstehen
+            cursor.execute('DELETE FROM tests WHERE teilnehmer_id = ?', (teilnehmer_id,))
+            cursor.execute('DELETE FROM teilnehmer WHERE teilnehmer_id = ?', (teilnehmer_id,))
+            conn.commit()
+            _load_teilnehmer.clear()
+            _load_tests.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Teilnehmer mit ID {teilnehmer_id} erfolgreich gelöscht.")
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Löschen des Teilnehmers mit ID {teilnehmer_id}: {e}")
+            raise e
+
+def merge_teilnehmer(keep_id, drop_id):
+    """
+    Führt zwei Teilnehmer zusammen: Alle Tests von `drop_id` werden `keep_id` zugeordnet,
+    danach wird `drop_id` gelöscht. Beides geschieht in einer Transaktion.
+    Gibt die Anzahl der umgehängten Tests zurück.
+    """
+    if int(keep_id) == int(drop_id):
+        raise ValueError("Ein Teilnehmer kann nicht mit sich selbst zusammengeführt werden.")
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if cursor.execute('SELECT COUNT(*) FROM teilnehmer WHERE teilnehmer_id IN (?, ?)',
+                              (keep_id, drop_id)).fetchone()[0] != 2:
+                raise ValueError(f"Teilnehmer {keep_id} oder {drop_id} existiert nicht.")
+            cursor.execute('UPDATE tests SET teilnehmer_id = ? WHERE teilnehmer_id = ?', (keep_id, drop_id))
+            moved = cursor.rowcount
+            cursor.execute('DELETE FROM teilnehmer WHERE teilnehmer_id = ?', (drop_id,))
+            conn.commit()
+            _load_teilnehmer.clear()
+            _load_tests.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Teilnehmer {drop_id} mit {keep_id} zusammengeführt ({moved} Tests umgehängt).")
+            return moved
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Zusammenführen der Teilnehmer {keep_id} und {drop_id}: {e}")
+            raise e
+
+def get_duplicate_participants(threshold=DUPLICATE_THRESHOLD):
+    """
+    Sucht mögliche Dubletten unter allen Teilnehmern des aktuellen Standorts
+    (Blocking über Geburtsdatum und Namensteile, vektorisierter Ähnlichkeitsscore).
+    Nur die Aktualisierung der Blocking-Schlüssel hält die Schreibsperre; Paarbildung und Bewertung
+    laufen über eine Leseverbindung.
+    """
+    site = get_current_site()
+    with _write_connection(site) as conn:
+        refresh_blocking_keys(conn)
+    return read_with_retry(site, lambda conn: find_duplicates(conn, threshold=threshold, refresh=False))
+
+def get_similar_participants(name, sv_nummer, geschlecht=None, exclude_id=None):
+    """
+    Sucht vorhandene Teilnehmer, die den angegebenen Daten ähneln (z. B. vor dem Anlegen).
+    Die Schreibsperre wird nur für die Aktualisierung der Blocking-Schlüssel gehalten.
+    """
+    site = get_current_site()
+    with _write_connection(site) as conn:
+        refresh_blocking_keys(conn)
+    return read_with_retry(site, lambda conn: find_duplicate_candidates(
+        conn, name, sv_nummer, geschlecht, exclude_id=exclude_id, refresh=False))
+
+def add_test(teilnehmer_id, test_datum,
+             textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+             raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+             grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+             zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+             gleichungen_erreichte_punkte, gleichungen_max_punkte,
+             brueche_erreichte_punkte, brueche_max_punkte,
+             gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent):
+    """
+    Fügt einen neuen Test für einen Teilnehmer in die Datenbank ein und prüft ihn auf Auffälligkeiten.
+    Befunde werden in derselben Transaktion in die Prüfliste geschrieben und zurückgegeben.
+    """
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO tests (teilnehmer_id, test_datum,
+                                   textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+                                   raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+                                   grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+                                   zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+                                   gleichungen_erreichte_punkte, gleichungen_max_punkte,
+                                   brueche_erreichte_punkte, brueche_max_punkte,
+                                   gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (int(teilnehmer_id), str(test_datum),
+                  textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+                  raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+                  grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+                  zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+                  gleichungen_erreichte_punkte, gleichungen_max_punkte,
+                  brueche_erreichte_punkte, brueche_max_punkte,
+                  gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent))
+            test_id = cursor.lastrowid
+            findings = check_test(conn, test_id, teilnehmer_id, test_datum, [
+                textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+                raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+                grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+                zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+                gleichungen_erreichte_punkte, gleichungen_max_punkte,
+                brueche_erreichte_punkte, brueche_max_punkte,
+            ], gesamt_prozent)
+            record_findings(conn, {test_id: findings})
+            conn.commit()
+            _load_tests.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Test für Teilnehmer mit ID {teilnehmer_id} erfolgreich hinzugefügt.")
+            return findings
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Hinzufügen des Tests für Teilnehmer mit ID {teilnehmer_id}: {e}")
+            raise e
+
+def update_test(test_id, test_datum,
+                textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+                raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+                grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+                zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+                gleichungen_erreichte_punkte, gleichungen_max_punkte,
+                brueche_erreichte_punkte, brueche_max_punkte,
+                gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent):
+    """
+    Aktualisiert die Daten eines vorhandenen Tests und prüft ihn erneut auf Auffälligkeiten.
+    Gibt die Befunde zurück.
+    """
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE tests
+                SET test_datum = ?,
+                    textaufgaben_erreichte_punkte = ?, textaufgaben_max_punkte = ?,
+                    raumvorstellung_erreichte_punkte = ?, raumvorstellung_max_punkte = ?,
+                    grundrechenarten_erreichte_punkte = ?, grundrechenarten_max_punkte = ?,
+                    zahlenraum_erreichte_punkte = ?, zahlenraum_max_punkte = ?,
+                    gleichungen_erreichte_punkte = ?, gleichungen_max_punkte = ?,
+                    brueche_erreichte_punkte = ?, brueche_max_punkte = ?,
+                    gesamt_erreichte_punkte = ?, gesamt_max_punkte = ?, gesamt_prozent = ?
+                WHERE test_id = ?
+            ''', (str(test_datum),
+                  textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+                  raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+                  grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+                  zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+                  gleichungen_erreichte_punkte, gleichungen_max_punkte,
+                  brueche_erreichte_punkte, brueche_max_punkte,
+                  gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent, int(test_id)))
+            row = cursor.execute('SELECT teilnehmer_id FROM tests WHERE test_id = ?', (int(test_id),)).fetchone()
+            findings = []
+            if row:
+                findings = check_test(conn, test_id, row[0], test_datum, [
+                    textaufgaben_erreichte_punkte, textaufgaben_max_punkte,
+                    raumvorstellung_erreichte_punkte, raumvorstellung_max_punkte,
+                    grundrechenarten_erreichte_punkte, grundrechenarten_max_punkte,
+                    zahlenraum_erreichte_punkte, zahlenraum_max_punkte,
+                    gleichungen_erreichte_punkte, gleichungen_max_punkte,
+                    brueche_erreichte_punkte, brueche_max_punkte,
+                ], gesamt_prozent)
+                record_findings(conn, {int(test_id): findings})
+            conn.commit()
+            _load_tests.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Test mit ID {test_id} erfolgreich aktualisiert.")
+            return findings
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Aktualisieren des Tests mit ID {test_id}: {e}")
+            raise e
+
+def delete_test(test_id):
+    """
+    Löscht einen Test aus der Datenbank.
+    """
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('DELETE FROM tests WHERE test_id = ?', (int(test_id),))
+            conn.commit()
+            _load_tests.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Test mit ID {test_id} erfolgreich gelöscht.")
+        except sqlite3.Error as e:
+            logging.error(f"Fehler beim Löschen des Tests mit ID {test_id}: {e}")
+            raise e
+
+def _test_rows(df, columns):
+    """
+    Wandelt Test-Zeilen in Parameter-Tupel für `executemany` um (Python-Typen, Datum als 'YYYY-MM-DD').
+    """
+    values = {col: df[col].tolist() for col in columns if col != "test_datum"}
+    values["test_datum"] = pd.to_datetime(df["test_datum"]).dt.strftime("%Y-%m-%d").tolist()
+    return list(zip(*[values[col] for col in columns]))
+
+def apply_test_changes(inserts, updates, deleted_ids):
+    """
+    Schreibt alle Änderungen aus der Rasterbearbeitung in einer einzigen Transaktion.
+    Args:
+        inserts (pandas.DataFrame): Neue Tests (mit 'teilnehmer_id' und allen Werten).
+        updates (pandas.DataFrame): Geänderte Tests (mit 'test_id' und allen Werten).
+        deleted_ids (list): IDs der zu löschenden Tests.
+    Returns:
+        tuple: Anzahl (eingefügt, aktualisiert, gelöscht, auffällig).
+    """
+    with _write_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            last_id = cursor.execute('SELECT COALESCE(MAX(test_id), 0) FROM tests').fetchone()[0]
+            if not inserts.empty:
+                insert_columns = ["teilnehmer_id"] + TEST_VALUE_COLUMNS
+                cursor.executemany(f'''
+                    INSERT INTO tests ({", ".join(insert_columns)})
+                    VALUES ({", ".join("?" * len(insert_columns))})
+                ''', _test_rows(inserts.astype({"teilnehmer_id": "int64"}), insert_columns))
+            if not updates.empty:
+                cursor.executemany(f'''
+                    UPDATE tests SET {", ".join(f"{col} = ?" for col in TEST_VALUE_COLUMNS)}
+                    WHERE test_id = ?
+                ''', _test_rows(updates.astype({"test_id": "int64"}), TEST_VALUE_COLUMNS + ["test_id"]))
+            if deleted_ids:
+                cursor.executemany('DELETE FROM tests WHERE test_id = ?', [(int(test_id),) for test_id in deleted_ids])
+
+            # Neue und geänderte Tests gemeinsam prüfen (neue IDs sind alle größer als die bisher größte)
+            checked_ids = [row[0] for row in cursor.execute('SELECT test_id FROM tests WHERE test_id > ?', (last_id,))]
+            if not updates.empty:
+                checked_ids += [int(test_id) for test_id in updates["test_id"]]
+            findings = check_tests(conn, checked_ids)
+            record_findings(conn, {test_id: findings.get(test_id, []) for test_id in checked_ids})
+            conn.commit()
+            _load_tests.clear()
+            _load_tests_by_beruf.clear()
+            logging.info(f"Tests gespeichert: {len(inserts)} hinzugefügt, {len(updates)} aktualisiert, "
+                         f"{len(deleted_ids)} gelöscht.")
+            return len(inserts), len(updates), len(deleted_ids), len(findings)
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Speichern der Teständerungen: {e}")
+            raise e
+
+# Prüfliste auffälliger Tests
+def get_test_review_queue(status="offen"):
+    """
+    Ruft die zur Prüfung vorgemerkten Tests des aktuellen Standorts ab.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('DELETE FROM teilnehmer WHERE teilnehmer_id = ?', (teilnehmer_id,))
-        conn.commit()
-        logging.info(f"Teilnehmer mit ID {teilnehmer_id} erfolgreich gelöscht.")
-    except sqlite3.Error as e:
-        logging.error(f"Fehler beim Löschen des Teilnehmers mit ID {teilnehmer_id}: {e}")
+        return get_review_queue(conn, status)
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        logging.error(f"Fehler beim Abrufen der Prüfliste: {e}")
+        raise e
+
+def mark_reviews_done(review_ids):
+    """
+    Markiert Einträge der Prüfliste als geprüft.
+    """
+    with _write_connection() as conn:
+        try:
+            conn.executemany("UPDATE test_review_queue SET status = 'geprüft' WHERE review_id = ?",
+                             [(int(review_id),) for review_id in review_ids])
+            conn.commit()
+            logging.info(f"{len(review_ids)} Einträge der Prüfliste als geprüft markiert.")
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Aktualisieren der Prüfliste: {e}")
+            raise e
+
+# Änderungsjournal und inkrementeller Export
+def get_change_journal(since_seq=0, limit=None):
+    """
+    Ruft die protokollierten Änderungen an 'teilnehmer' und 'tests' ab (Audit-Trail).
+    Mit `limit` werden nur die neuesten Einträge gelesen.
+    """
+    site = get_current_site()
+    get_db_connection(site)
+    try:
+        return read_with_retry(site, lambda conn: get_changes(conn, since_seq, limit))
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        logging.error(f"Fehler beim Abrufen des Änderungsjournals: {e}")
         raise e
+
+def export_incremental_snapshot(target=None):
+    """
+    Exportiert alle seit dem letzten Checkpoint geänderten Zeilen des aktuellen Standorts
+    als Delta-Datei nach `EXPORT_DIR/<Ziel>/<Standort>`. Jedes Ziel hat einen eigenen Checkpoint.
+    Das Ziel ist ein einfacher Name (Buchstaben, Ziffern, '_' und '-'), kein Pfad.
+    Gibt den Pfad der Delta-Datei zurück oder None, wenn sich nichts geändert hat.
+    """
+    site = get_current_site()
+    sink_dir = EXPORT_DIR
+    if target:
+        if not re.fullmatch(r"[\w-]+", target):
+            raise ValueError(f"Ungültiger Exportname: {target}")
+        sink_dir = EXPORT_DIR / target
+    with _write_connection(site) as conn:
+        return export_changes(conn, sink_dir / site_slug(site))
+
+# Online-Sicherungen
+def _site_backup_dir(site):
+    """
+    Sicherungsverzeichnis eines Standorts.
+    """
+    return BACKUP_DIR / site_slug(site)
+
+def _open_backup_connection(site):
+    """
+    Öffnet eine eigene Verbindung für eine Sicherung. Anders als die gemeinsame Schreibverbindung
+    sieht sie keine offenen Transaktionen anderer Sitzungen; die Schreibsperre wird daher nicht benötigt.
+    """
+    get_db_connection(site)
+    return connect_site(site)
+
+def create_database_backup(compress=False):
+    """
+    Erstellt im laufenden Betrieb eine Sicherung der Datenbank des aktuellen Standorts
+    und rotiert alte Sicherungen. Gibt den Pfad der Sicherung zurück.
+    """
+    site = get_current_site()
+    conn = _open_backup_connection(site)
+    try:
+        path = create_backup(conn, _site_backup_dir(site), compress=compress)
     finally:
         conn.close()
+    rotate_backups(_site_backup_dir(site))
+    return path
+
+def get_database_backups():
+    """
+    Listet alle vorhandenen Sicherungen des aktuellen Standorts auf, die neueste zuerst.
+    """
+    return list_backups(_site_backup_dir(get_current_site()))
+
+def restore_database_backup(path):
+    """
+    Stellt eine Sicherung für den aktuellen Standort wieder her, überprüft das Ergebnis
+    und leert die Daten-Caches. Gibt die Zeilenzahlen je Tabelle zurück.
+    Die Wiederherstellung wird im Änderungsjournal vermerkt; die Sequenznummern laufen dabei
+    über den Stand vor der Wiederherstellung hinaus weiter, und jedes Exportziel erhält beim
+    nächsten Export einen vollständigen Snapshot.
+    """
+    with _write_connection() as conn:
+        last_seq = journal_sequence(conn)
+        counts = restore_backup(path, conn)
+        try:
+            record_restore(conn, last_seq)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Fehler beim Vermerken der Wiederherstellung im Änderungsjournal: {e}")
+            raise e
+        _load_teilnehmer.clear()
+        _load_tests.clear()
+        _load_tests_by_beruf.clear()
+        return counts
+
+@st.cache_resource
+def start_backup_schedule():
+    """
+    Startet den Sicherungszeitplan für alle Standorte einmal pro Prozess.
+    """
+    return [
+        start_backup_scheduler(lambda site=site: _open_backup_connection(site), backup_dir=_site_backup_dir(site))
+        for site in get_sites()
+    ]
+
+# Standortübergreifende Auswertungen
+def get_federated_cohort_statistics(group_by="berufsbezeichnung"):
+    """
+    Berechnet Kohortenstatistiken zu 'gesamt_prozent' über alle Standorte hinweg.
+    Jeder Standort liefert nur Teilaggregate, die anschließend zusammengeführt werden.
+    """
+    # Sicherstellen, dass alle Standortdatenbanken geöffnet und initialisiert sind
+    for site in get_sites():
+        get_db_connection(site)
+    return federated_cohort_statistics(group_by)
+
+# Feature-Store und kohortenweites Risikomodell
+def _site_feature_store_dir(site):
+    """
+    Verzeichnis des Feature-Stores eines Standorts.
+    """
+    return FEATURE_STORE_DIR / site_slug(site)
+
+def get_feature_store():
+    """
+    Aktualisiert den Feature-Store des aktuellen Standorts inkrementell und öffnet ihn als Memory-Maps.
+    Gelesen wird über eine Leseverbindung, die keine offenen Transaktionen der Schreibverbindung sieht.
+    """
+    site = get_current_site()
+    read_with_retry(site, lambda conn: refresh_feature_store(conn, _site_feature_store_dir(site)))
+    return load_feature_store(_site_feature_store_dir(site))
+
+@st.cache_resource(max_entries=16)
+def _train_risk_model(site, stamp, target_percent):
+    # 'stamp' (Journal-Sequenz und Stichtag) macht den Cache-Eintrag nach Änderungen ungültig
+    return train_risk_classifier(load_feature_store(_site_feature_store_dir(site)), target_percent)
+
+def get_cohort_risk_scores(target_percent):
+    """
+    Bewertet alle Teilnehmer des aktuellen Standorts mit dem kohortenweiten Risikomodell.
+    Das Modell wird nur neu trainiert, wenn sich der Feature-Store oder der Zielwert geändert hat.
+    Gibt einen DataFrame mit 'teilnehmer_id' und 'risiko' zurück.
+    """
+    site = get_current_site()
+    store = get_feature_store()
+    model = _train_risk_model(site, feature_store_stamp(_site_feature_store_dir(site)), float(target_percent))
+    return score_cohort(model, store)
 
-# Initialisierung der Datenbank
-init_db()
+# Initialisierung der Datenbank des Standardstandorts
+get_db_connection()
@@ -0,0 +1,92 @@
+import pandas as pd
+
+# Feste Kategorien für Spalten mit bekanntem Wertebereich
+GESCHLECHT_DTYPE = pd.CategoricalDtype(["Männlich", "Weiblich", "Divers"])
+STATUS_DTYPE = pd.CategoricalDtype(["Aktiv", "Inaktiv"])
+
+KATEGORIEN = ["textaufgaben", "raumvorstellung", "grundrechenarten", "zahlenraum", "gleichungen", "brueche"]
+
+# Schema je Tabelle: Spaltenname -> Ziel-Datentyp im DataFrame
+TEILNEHMER_SCHEMA = {
+    "teilnehmer_id": "Int32",
+    "name": "object",
+    "sv_nummer": "object",
+    "geschlecht": GESCHLECHT_DTYPE,
+    "eintrittsdatum": "datetime64[ns]",
+    "austrittsdatum": "datetime64[ns]",
+    "berufsbezeichnung": "category",
+    "status": STATUS_DTYPE,
+}
+
+TESTS_SCHEMA = {
+    "test_id": "Int32",
+    "teilnehmer_id": "Int32",
+    "test_datum": "datetime64[ns]",
+    **{
+        f"{kategorie}_{art}_punkte": "float64"
+        for kategorie in KATEGORIEN
+        for art in ("erreichte", "max")
+    },
+    "gesamt_erreichte_punkte": "float64",
+    "gesamt_max_punkte": "float64",
+    "gesamt_prozent": "float64",
+}
+
+# Spalten eines Tests, die beim Einfügen und Aktualisieren geschrieben werden
+TEST_VALUE_COLUMNS = [col for col in TESTS_SCHEMA if col not in ("test_id", "teilnehmer_id")]
+
+TABLE_SCHEMAS = {
+    "teilnehmer": TEILNEHMER_SCHEMA,
+    "tests": TESTS_SCHEMA,
+}
+
+
+def apply_schema(df, schema):
+    """
+    Wandelt die Spalten eines DataFrames in die im Schema deklarierten Datentypen um.
+    Spalten, die nicht im Schema stehen, bleiben unverändert.
+    Args:
+        df (pandas.DataFrame): Ungetypter DataFrame, z. B. aus `pd.read_sql_query`.
+        schema (dict): Zuordnung Spaltenname -> Datentyp.
+    Returns:
+        pandas.DataFrame: DataFrame mit kompakten Datentypen.
+    """
+    columns = {}
+    for column in df.columns:
+        dtype = schema.get(column)
+        if dtype is None:
+            columns[column] = df[column]
+        elif dtype == "datetime64[ns]":
+            # Leere Strings und NULL werden zu NaT
+            columns[column] = pd.to_datetime(df[column].replace("", None), errors="coerce")
+        else:
+            columns[column] = df[column].astype(dtype)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def read_typed(conn, table, query, params=None):
+    """
+    Führt eine Abfrage aus und gibt das Ergebnis mit dem Schema der Tabelle zurück.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        table (str): Name der Tabelle, deren Schema angewendet wird.
+        query (str): SQL-Abfrage.
+        params (tuple): Optionale Abfrageparameter.
+    Returns:
+        pandas.DataFrame: Getypter DataFrame.
+    """
+    df = pd.read_sql_query(query, conn, params=params)
+    return apply_schema(df, TABLE_SCHEMAS[table])
+
+
+def shared_view(df):
+    """
+    Gibt eine flache Kopie eines gemeinsam genutzten DataFrames zurück.
+    Dank Copy-on-Write werden keine Daten kopiert; Änderungen an der Kopie
+    (neue Spalten, Wertzuweisungen) erreichen den gecachten DataFrame nicht.
+    Args:
+        df (pandas.DataFrame): Gecachter DataFrame.
+    Returns:
+        pandas.DataFrame: Schreibgeschützte Sicht auf die Daten.
+    """
+    return df.copy(deep=False)
@@ -0,0 +1,292 @@
+import logging
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from app.change_journal import get_checkpoint, set_checkpoint
+from app.db_schema import read_typed
+
+# Checkpoint im Änderungsjournal, bis zu dem die Blocking-Schlüssel aktuell sind
+BLOCKING_SINK = "dedup_blocking"
+# Blöcke mit mehr Mitgliedern (z. B. sehr häufige Nachnamen) werden nicht paarweise verglichen
+MAX_BLOCK_SIZE = 200
+DUPLICATE_THRESHOLD = 0.75
+
+# Gewichtung der Einzelähnlichkeiten im Gesamtscore
+SCORE_WEIGHTS = {
+    "name_aehnlichkeit": 0.5,
+    "sv_aehnlichkeit": 0.3,
+    "gleiches_geburtsdatum": 0.15,
+    "gleiches_geschlecht": 0.05,
+}
+
+_UMLAUTE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_refresh_lock = threading.Lock()
+
+
+def normalize_names(names):
+    """
+    Normalisiert Namen für den Vergleich: Kleinschreibung, Umlaute ausgeschrieben,
+    Akzente entfernt, Satzzeichen entfernt, Namensteile alphabetisch sortiert
+    ('Müller, Hans' und 'Hans Mueller' ergeben denselben Wert).
+    Args:
+        names (pandas.Series): Namen der Teilnehmer.
+    Returns:
+        pandas.Series: Normalisierte Namen.
+    """
+    ascii_names = (names.astype(str).str.lower().str.translate(_UMLAUTE).str.normalize("NFKD")
+                   .str.encode("ascii", "ignore").str.decode("ascii"))
+    return ascii_names.str.findall(r"[a-z]+").map(lambda tokens: " ".join(sorted(tokens)))
+
+
+def blocking_keys(teilnehmer):
+    """
+    Berechnet die Blocking-Schlüssel je Teilnehmer: das in der SV-Nummer kodierte Geburtsdatum
+    ('g:YYYY-MM-DD') und jeder normalisierte Namensteil mit mindestens drei Buchstaben ('n:token').
+    Args:
+        teilnehmer (pandas.DataFrame): Teilnehmer mit 'teilnehmer_id', 'name' und 'sv_nummer'.
+    Returns:
+        pandas.DataFrame: Spalten 'schluessel' und 'teilnehmer_id' (ohne Duplikate).
+    """
+    ids = teilnehmer["teilnehmer_id"].astype("int64")
+    geburt = _birth_dates(teilnehmer["sv_nummer"])
+    birth_keys = pd.DataFrame({"schluessel": "g:" + geburt.dt.strftime("%Y-%m-%d"), "teilnehmer_id": ids})
+
+    tokens = normalize_names(teilnehmer["name"]).str.split().explode()
+    name_keys = pd.DataFrame({"schluessel": "n:" + tokens, "teilnehmer_id": ids.reindex(tokens.index)})
+    name_keys = name_keys[tokens.str.len() >= 3]
+
+    keys = pd.concat([birth_keys, name_keys], ignore_index=True).dropna()
+    return keys.drop_duplicates().astype({"teilnehmer_id": "int64"})
+
+
+def init_dedup_index(conn):
+    """
+    Legt die Tabelle der Blocking-Schlüssel an. Der Primärschlüssel (schluessel, teilnehmer_id)
+    dient als Index für die Blocksuche, der zweite Index für das Aktualisieren einzelner Teilnehmer.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS teilnehmer_blocking (
+            schluessel TEXT NOT NULL,
+            teilnehmer_id INTEGER NOT NULL,
+            PRIMARY KEY (schluessel, teilnehmer_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_teilnehmer_blocking_id ON teilnehmer_blocking (teilnehmer_id)')
+    conn.commit()
+
+
+def refresh_blocking_keys(conn):
+    """
+    Aktualisiert die Blocking-Schlüssel inkrementell anhand des Änderungsjournals:
+    Nur Teilnehmer, die seit dem letzten Lauf angelegt, geändert oder gelöscht wurden, werden neu verschlüsselt.
+    Ohne Checkpoint oder bei leerer Schlüsseltabelle werden die Schlüssel aller Teilnehmer aufgebaut, da
+    Bestände aus der Zeit vor den Journal-Triggern (z. B. neu angebundene Standorte) nicht im Journal stehen.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+    Returns:
+        int: Anzahl neu verschlüsselter Teilnehmer.
+    """
+    with _refresh_lock:
+        last_seq = get_checkpoint(conn, BLOCKING_SINK)
+        upper_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_journal").fetchone()[0]
+        missing_keys = conn.execute('''
+            SELECT NOT EXISTS (SELECT 1 FROM export_checkpoints WHERE sink = ?)
+                OR (NOT EXISTS (SELECT 1 FROM teilnehmer_blocking) AND EXISTS (SELECT 1 FROM teilnehmer))
+        ''', (BLOCKING_SINK,)).fetchone()[0]
+        if missing_keys:
+            count = _rekey(conn, None, upper_seq)
+        elif upper_seq <= last_seq:
+            return 0
+        else:
+            count = _rekey(conn, last_seq, upper_seq)
+    logging.info(f"Blocking-Schlüssel für {count} Teilnehmer aktualisiert.")
+    return count
+
+
+def _rekey(conn, last_seq, upper_seq):
+    """
+    Ersetzt die Schlüssel aller im Journalbereich geänderten Teilnehmer in einer Transaktion.
+    Ohne `last_seq` werden die Schlüssel aller Teilnehmer neu aufgebaut.
+    """
+    try:
+        if last_seq is None:
+            conn.execute("DELETE FROM teilnehmer_blocking")
+            teilnehmer = pd.read_sql_query("SELECT teilnehmer_id, name, sv_nummer FROM teilnehmer", conn)
+        else:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS dedup_affected (teilnehmer_id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM dedup_affected")
+            conn.execute('''
+                INSERT OR IGNORE INTO dedup_affected
+                SELECT row_id FROM change_journal
+                WHERE table_name = 'teilnehmer' AND seq > ? AND seq <= ?
+            ''', (last_seq, upper_seq))
+            conn.execute("DELETE FROM teilnehmer_blocking WHERE teilnehmer_id IN (SELECT teilnehmer_id FROM dedup_affected)")
+            teilnehmer = pd.read_sql_query('''
+                SELECT t.teilnehmer_id, t.name, t.sv_nummer
+                FROM teilnehmer t JOIN dedup_affected a ON a.teilnehmer_id = t.teilnehmer_id
+            ''', conn)
+        keys = blocking_keys(teilnehmer)
+        conn.executemany("INSERT INTO teilnehmer_blocking (schluessel, teilnehmer_id) VALUES (?, ?)",
+                         keys[["schluessel", "teilnehmer_id"]].itertuples(index=False, name=None))
+        set_checkpoint(conn, BLOCKING_SINK, upper_seq)
+        conn.commit()
+        return len(teilnehmer)
+    except sqlite3.Error as e:
+        conn.rollback()
+        logging.error(f"Fehler beim Aktualisieren der Blocking-Schlüssel: {e}")
+        raise e
+
+
+def _birth_dates(sv_nummern):
+    """
+    Dekodiert das Geburtsdatum aus den letzten sechs Ziffern (TTMMJJ) wie `calculate_age`; ungültig ergibt NaT.
+    """
+    return pd.to_datetime(sv_nummern.astype(str).str[-6:], format="%d%m%y", errors="coerce")
+
+
+def score_pairs(teilnehmer, pos_a, pos_b):
+    """
+    Bewertet Kandidatenpaare vektorisiert. Die Vergleichsmerkmale werden einmal je Teilnehmer
+    berechnet und dann für alle Paare über die Positionen indiziert.
+    - Namensähnlichkeit: Kosinus-Ähnlichkeit der Zeichen-Trigramme der normalisierten Namen.
+    - SV-Ähnlichkeit: Anteil übereinstimmender Ziffern an gleicher Position.
+    Args:
+        teilnehmer (pandas.DataFrame): Teilnehmer mit 'name', 'sv_nummer' und 'geschlecht'.
+        pos_a (numpy.ndarray): Zeilenpositionen der ersten Teilnehmer der Paare.
+        pos_b (numpy.ndarray): Zeilenpositionen der zweiten Teilnehmer der Paare.
+    Returns:
+        pandas.DataFrame: Einzelähnlichkeiten und 'score' je Paar.
+    """
+    vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 3), use_idf=False)
+    matrix = vectorizer.fit_transform(normalize_names(teilnehmer["name"]))
+    # Zeilen sind L2-normiert; das zeilenweise Skalarprodukt ist die Kosinus-Ähnlichkeit
+    name_similarity = np.asarray(matrix[pos_a].multiply(matrix[pos_b]).sum(axis=1)).ravel()
+
+    sv = teilnehmer["sv_nummer"].astype(str).str.pad(10).str[-10:].to_numpy().astype("U10")
+    digits = sv.view("U1").reshape(len(sv), 10)
+    sv_similarity = (digits[pos_a] == digits[pos_b]).mean(axis=1)
+
+    birth = _birth_dates(teilnehmer["sv_nummer"]).to_numpy()
+    geschlecht = teilnehmer["geschlecht"].astype(str).to_numpy()
+
+    scores = pd.DataFrame({
+        "name_aehnlichkeit": name_similarity,
+        "sv_aehnlichkeit": sv_similarity,
+        "gleiches_geburtsdatum": birth[pos_a] == birth[pos_b],
+        "gleiches_geschlecht": geschlecht[pos_a] == geschlecht[pos_b],
+    })
+    scores["score"] = sum(scores[column].astype("float64") * weight for column, weight in SCORE_WEIGHTS.items())
+    return scores
+
+
+def candidate_pairs(conn, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Ermittelt alle Paare, die mindestens einen Blocking-Schlüssel teilen, über den Index der Schlüsseltabelle.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        max_block_size (int): Größere Blöcke werden übersprungen.
+    Returns:
+        pandas.DataFrame: Spalten 'id_a' und 'id_b' mit id_a < id_b.
+    """
+    return pd.read_sql_query('''
+        WITH blocks AS (
+            SELECT schluessel FROM teilnehmer_blocking
+            GROUP BY schluessel
+            HAVING COUNT(*) BETWEEN 2 AND ?
+        )
+        SELECT DISTINCT a.teilnehmer_id AS id_a, b.teilnehmer_id AS id_b
+        FROM blocks k
+        JOIN teilnehmer_blocking a ON a.schluessel = k.schluessel
+        JOIN teilnehmer_blocking b ON b.schluessel = k.schluessel AND b.teilnehmer_id > a.teilnehmer_id
+    ''', conn, params=(max_block_size,))
+
+
+def find_duplicates(conn, threshold=DUPLICATE_THRESHOLD, max_block_size=MAX_BLOCK_SIZE, refresh=True):
+    """
+    Sucht mögliche Dubletten im gesamten Teilnehmerbestand.
+    Paarweise verglichen wird nur innerhalb der Blöcke, nicht jeder mit jedem.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        threshold (float): Mindestscore (0-1) für eine mögliche Dublette.
+        max_block_size (int): Größere Blöcke werden übersprungen.
+        refresh (bool): Blocking-Schlüssel vorher aktualisieren. Mit False genügt eine reine Leseverbindung;
+            der Aufrufer aktualisiert die Schlüssel dann selbst mit `refresh_blocking_keys`.
+    Returns:
+        pandas.DataFrame: Je Paar beide Teilnehmer, Anzahl Tests, Einzelähnlichkeiten und 'score', absteigend sortiert.
+    """
+    if refresh:
+        refresh_blocking_keys(conn)
+    pairs = candidate_pairs(conn, max_block_size)
+    teilnehmer = read_typed(conn, "teilnehmer", '''
+        SELECT t.teilnehmer_id, t.name, t.sv_nummer, t.geschlecht,
+               (SELECT COUNT(*) FROM tests x WHERE x.teilnehmer_id = t.teilnehmer_id) AS anzahl_tests
+        FROM teilnehmer t
+        ORDER BY t.teilnehmer_id
+    ''').astype({"teilnehmer_id": "int64"})
+
+    if pairs.empty:
+        columns = [f"{c}_{side}" for side in ("a", "b") for c in teilnehmer.columns]
+        return pd.DataFrame(columns=[c.replace("teilnehmer_id", "id") for c in columns] + [*SCORE_WEIGHTS, "score"])
+
+    # Nur Teilnehmer, die in mindestens einem Paar vorkommen, werden vektorisiert
+    teilnehmer = teilnehmer[teilnehmer["teilnehmer_id"].isin(np.union1d(pairs["id_a"], pairs["id_b"]))]
+    ids = teilnehmer["teilnehmer_id"].to_numpy()
+    pos_a = np.searchsorted(ids, pairs["id_a"].to_numpy())
+    pos_b = np.searchsorted(ids, pairs["id_b"].to_numpy())
+    scores = score_pairs(teilnehmer, pos_a, pos_b)
+    keep = (scores["score"] >= threshold).to_numpy()
+
+    left = teilnehmer.iloc[pos_a[keep]].reset_index(drop=True)
+    right = teilnehmer.iloc[pos_b[keep]].reset_index(drop=True)
+    result = pd.concat([left.add_suffix("_a"), right.add_suffix("_b"), scores[keep].reset_index(drop=True)], axis=1)
+    result = result.rename(columns={"teilnehmer_id_a": "id_a", "teilnehmer_id_b": "id_b"})
+    logging.info(f"Dublettenprüfung: {len(pairs)} Kandidatenpaare aus Blöcken bewertet.")
+    return result.sort_values("score", ascending=False, ignore_index=True)
+
+
+def find_duplicate_candidates(conn, name, sv_nummer, geschlecht=None, threshold=DUPLICATE_THRESHOLD,
+                              exclude_id=None, refresh=True):
+    """
+    Sucht vorhandene Teilnehmer, die einem (neuen) Datensatz ähneln, z. B. beim Anlegen.
+    Es werden nur die Teilnehmer gelesen, die einen Blocking-Schlüssel mit dem Datensatz teilen.
+    Args:
+        conn (sqlite3.Connection): Offene Datenbankverbindung.
+        name (str): Name.
+        sv_nummer (str): SV-Nummer.
+        geschlecht (str): Geschlecht (optional).
+        threshold (float): Mindestscore (0-1).
+        exclude_id (int): Teilnehmer, der nicht mit sich selbst verglichen werden soll.
+        refresh (bool): Blocking-Schlüssel vorher aktualisieren (siehe `find_duplicates`).
+    Returns:
+        pandas.DataFrame: Ähnliche Teilnehmer mit 'score', absteigend sortiert.
+    """
+    if refresh:
+        refresh_blocking_keys(conn)
+    record = pd.DataFrame({"teilnehmer_id": [0], "name": [name], "sv_nummer": [sv_nummer],
+                           "geschlecht": [geschlecht or ""]})
+    keys = blocking_keys(record)["schluessel"].tolist()
+    if not keys:
+        return pd.DataFrame(columns=["teilnehmer_id", "name", "sv_nummer", "geschlecht", "score"])
+
+    placeholders = ", ".join("?" * len(keys))
+    candidates = read_typed(conn, "teilnehmer", f'''
+        SELECT t.teilnehmer_id, t.name, t.sv_nummer, t.geschlecht
+        FROM teilnehmer t
+        WHERE t.teilnehmer_id IN (SELECT teilnehmer_id FROM teilnehmer_blocking WHERE schluessel IN ({placeholders}))
+          AND t.teilnehmer_id IS NOT ?
+    ''', (*keys, exclude_id))
+    if candidates.empty:
+        return candidates.assign(score=pd.Series(dtype="float64"))
+
+    # Position 0 ist der neue Datensatz, die Kandidaten folgen ab Position 1
+    scores = score_pairs(pd.concat([record, candidates], ignore_index=True),
+                         np.zeros(len(candidates), dtype="int64"), np.arange(1, len(candidates) + 1))
+    if geschlecht is None:
+        # Ohne Angabe zählt das Geschlecht nicht gegen den Kandidaten
+        scores["score"] += SCORE_WEIGHTS["gleiches_geschlecht"]
+    result = pd.concat([candidates.reset_index(drop=True), scores[["score"]]], axis=1)
+    return result[result["score"] >= threshold].sort_values("score", ascending=False, ignore_index=True)
@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from app.change_journal import last_restore
+from app.db_schema import KATEGORIEN, read_typed
+
+# Standardverzeichnis des Feature-Stores
+FEATURE_STORE_DIR = Path("feature_store")
+FEATURE_STORE_VERSION = 2
+
+SERIES = KATEGORIEN + ["gesamt"]
+FEATURE_NAMES = (
+    [f"{s}_steigung" for s in SERIES]
+    + [f"{s}_letzter" for s in SERIES]
+    + ["anzahl_tests", "tests_pro_30_tage", "tage_seit_eintritt", "tage_seit_letztem_test"]
+)
+
+# Arrays des Stores (je Datei ein .npy, lesend als Memory-Map geöffnet)
+_ARRAYS = ("ids", "current", "previous", "last_total")
+# Die Arrays werden nie überschrieben, sondern als neue Generation geschrieben; meta.json verweist auf die
+# gültige Generation. Die vorige bleibt für Leser erhalten, die meta.json gerade erst gelesen haben.
+_KEEP_GENERATIONS = 2
+_refresh_lock = threading.Lock()
+
+
+def category_percentages(tests):
+    """
+    Berechnet die Prozentwerte je Kategorie und gesamt als Matrix (Zeilen = Tests).
+    """
+    columns = {}
+    for c in KATEGORIEN:
+        maximal = tests[f"{c}_max_punkte"].astype("float64")
+        columns[c] = tests[f"{c}_erreichte_punkte"].astype("float64") / maximal.where(maximal > 0) * 100
+    columns["gesamt"] = tests["gesamt_prozent"].astype("float64")
+    return pd.DataFrame(columns, index=tests.index)
+
+
+def compute_features(tests, teilnehmer, reference_dates):
+    """
+    Berechnet die Merkmale je Teilnehmer vektorisiert über alle Teilnehmer hinweg.
+    Steigungen werden per geschlossener Formel der linearen Regression aus Gruppensummen
+    berechnet (Prozentpunkte pro Tag), ohne einzelne Modelle anzupassen.
+    Args:
+        tests (pandas.DataFrame): Getypte Tests (Schema 'tests').
+        teilnehmer (pandas.DataFrame): Getypte Teilnehmer mit 'teilnehmer_id' und 'eintrittsdatum'.
+        reference_dates (pandas.Series): Stichtag je 'teilnehmer_id' für Betriebszugehörigkeit und Testabstand.
+    Returns:
+        pandas.DataFrame: Merkmale (Spalten FEATURE_NAMES), Index 'teilnehmer_id'.
+    """
+    ids = teilnehmer["teilnehmer_id"].astype("int64")
+    features = pd.DataFrame(np.nan, index=pd.Index(ids, name="teilnehmer_id"), columns=FEATURE_NAMES)
+    features["anzahl_tests"] = 0.0
+    reference = reference_dates.reindex(features.index)
+    eintritt = pd.Series(teilnehmer["eintrittsdatum"].to_numpy(), index=features.index)
+    features["tage_seit_eintritt"] = (reference - eintritt).dt.days.astype("float64")
+    if tests.empty:
+        return features
+
+    tests = tests.sort_values(["teilnehmer_id", "test_datum", "test_id"])
+    key = tests["teilnehmer_id"].astype("int64").to_numpy()
+    # Tage relativ zum ersten Test des Teilnehmers vermeiden Auslöschung in den Summen
+    first = tests.groupby(key)["test_datum"].transform("min")
+    x = (tests["test_datum"] - first).dt.days.astype("float64").to_numpy()
+    y = category_percentages(tests)
+
+    sums = pd.DataFrame({"n": 1.0, "x": x, "xx": x * x}, index=tests.index)
+    for s in SERIES:
+        valid = y[s].notna().to_numpy()
+        ys = y[s].fillna(0.0).to_numpy()
+        sums[f"n_{s}"] = valid.astype("float64")
+        sums[f"x_{s}"] = np.where(valid, x, 0.0)
+        sums[f"xx_{s}"] = np.where(valid, x * x, 0.0)
+        sums[f"y_{s}"] = ys
+        sums[f"xy_{s}"] = x * ys
+    grouped = sums.groupby(key).sum()
+
+    for s in SERIES:
+        n, sx, sxx = grouped[f"n_{s}"], grouped[f"x_{s}"], grouped[f"xx_{s}"]
+        denominator = n * sxx - sx * sx
+        slope = (n * grouped[f"xy_{s}"] - sx * grouped[f"y_{s}"]) / denominator.where(denominator > 0)
+        features.loc[grouped.index, f"{s}_steigung"] = slope
+        features.loc[grouped.index, f"{s}_letzter"] = y[s].groupby(key).last()
+
+    span_days = pd.Series(x, index=tests.index).groupby(key).max()
+    last_test = tests.groupby(key)["test_datum"].max()
+    features.loc[grouped.index, "anzahl_tests"] = grouped["n"]
+    features.loc[grouped.index, "tests_pro_30_tage"] = grouped["n"] / np.maximum(span_days, 1) * 30
+    features.loc[grouped.index, "tage_seit_letztem_test"] = (reference.loc[grouped.index] - last_test).dt.days
+    return features
+
+
+def build_feature_rows(tests, teilnehmer, today=None):
+    """
+    Berechnet alle Store-Zeilen für die übergebenen Teilnehmer.
+    - current: Merkmale über die gesamte Testhistorie (Stichtag heute), für die Bewertung.
+    - previous: Merkmale ohne den letzten Test (Stichtag = Datum des letzten Tests), für das Training.
+    - last_total: Gesamtprozent des letzten Tests (Zielgröße für das Training).
+    Args:
+        tests (pandas.DataFrame): Getypte Tests der Teilnehmer.
+        teilnehmer (pandas.DataFrame): Getypte Teilnehmer.
+        today (pandas.Timestamp): Stichtag für 'current' (Standard: heute).
+    Returns:
+        dict: Arrays 'ids', 'current', 'previous', 'last_total' (nach ID sortiert).
+    """
+    teilnehmer = teilnehmer.sort_values("teilnehmer_id")
+    ids = teilnehmer["teilnehmer_id"].astype("int64").to_numpy()
+    today = pd.Timestamp(today or pd.Timestamp.now().normalize())
+
+    tests = tests.sort_values(["teilnehmer_id", "test_datum", "test_id"])
+    is_last = ~tests["teilnehmer_id"].duplicated(keep="last")
+    last_tests = tests[is_last].set_index(tests.loc[is_last, "teilnehmer_id"].astype("int64"))
+
+    current = compute_features(tests, teilnehmer, pd.Series(today, index=ids))
+    previous_reference = last_tests["test_datum"].reindex(ids).fillna(today)
+    previous = compute_features(tests[~is_last], teilnehmer, previous_reference)
+    last_total = last_tests["gesamt_prozent"].reindex(ids).astype("float64")
+
+    return {
+        "ids": ids,
+        "current": current.to_numpy(dtype="float32"),
+        "previous": previous.to_numpy(dtype="float32"),
+        "last_total": last_total.to_numpy(dtype="float32"),
+    }
+
+
+def _load_meta(store_dir):
+    try:
+        return json.loads((store_dir / "meta.json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _array_path(store_dir, name, generation):
+    return store_dir / f"{name}.{generation}.npy"
+
+
+def _write_store(store_dir, arrays, last_seq, meta=None):
+    """
+    Schreibt alle Arrays als neue Generation und schaltet erst danach die Metadaten um.
+    Bereits geöffnete Memory-Maps anderer Sitzungen sehen so nie eine halb geschriebene Zeile.
+    """
+    store_dir.mkdir(parents=True, exist_ok=True)
+    generation = (meta or {}).get("generation", 0) + 1
+    for name in _ARRAYS:
+        np.save(_array_path(store_dir, name, generation), arrays[name])
+    _write_meta(store_dir, last_seq, len(arrays["ids"]), generation)
+    for path in store_dir.glob("*.npy"):
+        parts = path.name.split(".")
+        if len(parts) == 3 and parts[1].isdigit() and int(parts[1]) <= generation - _KEEP_GENERATIONS:
+            path.unlink(missing_ok=True)
+
+
+def _write_meta(store_dir, last_seq, rows, generation):
+    """
+    Schreibt die Metadaten des Stores (gültige Generation, verarbeitete Journal-Sequenz und Stichtag
+    der Berechnung) atomar über eine temporäre Datei.
+    """
+    meta = {"version": FEATURE_STORE_VERSION, "features": FEATURE_NAMES, "generation": generation,
+            "last_seq": last_seq, "rows": int(rows), "date": str(pd.Timestamp.now().date())}
+    tmp_path = store_dir / "meta.json.tmp"
+    tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp_path, store_dir / "meta.json")
+
+
+def load_feature_store(store_dir=FEATURE_STORE_DIR):
+    """
+    Öffnet den Feature-Store lesend als Memory-Maps.
+    Args:
+        store_dir (str | Path): Verzeichnis des Stores.
+    Returns:
+        dict | None: Arrays 'ids', 'current', 'previous', 'last_total' oder None, wenn kein Store existiert.
+    """
+    store_dir = Path(store_dir)
+    meta = _load_meta(store_dir)
+    if meta is None or meta.get("version") != FEATURE_STORE_VERSION:
+        return None
+    return {name: np.load(_array_path(store_dir, name, meta["generation"]), mmap_mode="r") for name in _ARRAYS}
+
+
+def feature_store_stamp(store_dir=FEATURE_STORE_DIR):
+    """
+    Gibt den Stand des Stores als (verarbeitete Journal-Sequenz, Stichtag) zurück, z. B. als Cache-Schlüssel
+    für darauf trainierte Modelle. Ohne Store wird None zurückgegeben.
+    """
+    meta = _load_meta(Path(store_dir))
+    return None if meta is None else (meta["last_seq"], meta["date"])
+
+
+def _read_for_ids(conn, teilnehmer_ids):
+    """
+    Liest Teilnehmer und Tests für eine Menge von IDs (in Blöcken wegen des SQLite-Parameterlimits).
+    """
+    teilnehmer_parts, test_parts = [], []
+    ids = sorted(int(i) for i in teilnehmer_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        teilnehmer_parts.append(read_typed(
+            conn, "teilnehmer", f"SELECT * FROM teilnehmer WHERE teilnehmer_id IN ({placeholders})", tuple(chunk)))
+        test_parts.append(read_typed(
+            conn, "tests", f"SELECT * FROM tests WHERE teilnehmer_id IN ({placeholders})", tuple(chunk)))
+    return pd.concat(teilnehmer_parts, ignore_index=True), pd.concat(test_parts, ignore_index=True)
+
+
+def refresh_feature_store(conn, store_dir=FEATURE_STORE_DIR):
+    """
+    Aktualisiert den Feature-Store inkrementell anhand des Änderungsjournals.
+    Nur Teilnehmer, deren Stammdaten oder Tests sich seit dem letzten Lauf geändert haben,
+    werden neu berechnet und mit den übrigen Zeilen zu einer neuen Generation der Arrays zusammengeführt.
+    Die Datenbank wird nur gelesen; eine Leseverbindung, die ausschließlich festgeschriebene Daten sieht,
+    genügt und verhindert, dass Änderungen einer später verworfenen Transaktion übernommen werden.
+    Ohne Store oder nach einer Wiederherstellung aus einer Sicherung wird vollständig neu aufgebaut.
+    Args:
+        conn (sqlite3.Connection): Datenbankverbindung des Standorts.
+        store_dir (str | Path): Verzeichnis des Stores.
+    Returns:
+        int: Anzahl neu berechneter Teilnehmer.
+    """
+    store_dir = Path(store_dir)
+    with _refresh_lock:
+        meta = _load_meta(store_dir)
+        upper_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_journal").fetchone()[0]
+        # Der Stichtag 'heute' ändert sich täglich; Zeilen vom Vortag werden daher vollständig neu berechnet
+        stale = (meta is None or meta.get("version") != FEATURE_STORE_VERSION or meta["last_seq"] > upper_seq
+                 or meta.get("date") != str(pd.Timestamp.now().date())
+                 or last_restore(conn, meta["last_seq"]) is not None)
+
+        if stale:
+            teilnehmer = read_typed(conn, "teilnehmer", "SELECT * FROM teilnehmer")
+            tests = read_typed(conn, "tests", "SELECT * FROM tests")
+            _write_store(store_dir, build_feature_rows(tests, teilnehmer), upper_seq, meta)
+            logging.info(f"Feature-Store vollständig aufgebaut: {len(teilnehmer)} Teilnehmer.")
+            return len(teilnehmer)
+
+        if upper_seq == meta["last_seq"]:
+            return 0
+
+        affected = {row[0] for row in conn.execute('''
+            SELECT DISTINCT CASE table_name
+                WHEN 'teilnehmer' THEN row_id
+                ELSE json_extract(row_data, '$.teilnehmer_id')
+            END
+            FROM change_journal
+            WHERE seq > ? AND seq <= ?
+        ''', (meta["last_seq"], upper_seq)) if row[0] is not None}
+
+        if not affected:
+            _write_meta(store_dir, upper_seq, meta["rows"], meta["generation"])
+            return 0
+
+        teilnehmer, tests = _read_for_ids(conn, affected)
+        rows = build_feature_rows(tests, teilnehmer)
+        store = load_feature_store(store_dir)
+        # Geänderte und gelöschte Teilnehmer fallen weg, neu berechnete Zeilen kommen hinzu
+        keep = ~np.isin(store["ids"], np.fromiter(affected, dtype="int64"))
+        merged = {name: np.concatenate([store[name][keep], rows[name]]) for name in _ARRAYS}
+        order = np.argsort(merged["ids"], kind="stable")
+        del store
+        _write_store(store_dir, {name: merged[name][order] for name in _ARRAYS}, upper_seq, meta)
+        logging.info(f"Feature-Store inkrementell aktualisiert: {len(affected)} Teilnehmer neu berechnet.")
+        return len(affected)
+
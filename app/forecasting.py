@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from sklearn.linear_model import LinearRegression
+from app.feature_store import SERIES, category_percentages
+
+# Standardwerte für die Prognose je Kategorie
+FORECAST_HORIZON_DAYS = 30
+CONFIDENCE_LEVEL = 0.95
+
+
+def category_trend_matrix(df_tests):
+    """
+    Bereitet die Testhistorie eines Teilnehmers für die Prognose auf.
+    Args:
+        df_tests (pandas.DataFrame): Getypte Tests eines Teilnehmers.
+    Returns:
+        tuple: (Tage seit erstem Test als Vektor, Prozentmatrix mit den Spalten SERIES, Datum des ersten Tests).
+    """
+    df_tests = df_tests.sort_values(["test_datum", "test_id"])
+    start = df_tests["test_datum"].min()
+    x = (df_tests["test_datum"] - start).dt.days.to_numpy(dtype="float64")
+    return x, category_percentages(df_tests)[SERIES], start
+
+
+def forecast_category_trends(df_tests, horizon_days=FORECAST_HORIZON_DAYS, confidence=CONFIDENCE_LEVEL):
+    """
+    Prognostiziert alle Kategorien und den Gesamtwert mit einer einzigen Mehrfachausgabe-Regression.
+    Alle Zielgrößen teilen dieselbe Designmatrix; Konfidenzintervalle für den erwarteten Verlauf
+    werden aus den Residuen je Zielgröße vektorisiert berechnet.
+    Fehlende Kategorienwerte (Maximalpunkte 0) werden mit dem Mittelwert der Kategorie aufgefüllt.
+    Args:
+        df_tests (pandas.DataFrame): Getypte Tests eines Teilnehmers.
+        horizon_days (int): Anzahl der prognostizierten Tage nach dem letzten Test.
+        confidence (float): Konfidenzniveau der Intervalle.
+    Returns:
+        pandas.DataFrame: Je Tag und Reihe 'reihe', 'tag', 'datum', 'prognose', 'untere_grenze', 'obere_grenze'.
+            Die Intervalle sind NaN, solange weniger als drei Tests an verschiedenen Tagen vorliegen.
+    """
+    x, y, start = category_trend_matrix(df_tests)
+    observed = y.notna().any().to_numpy()
+    y_filled = y.fillna(y.mean()).fillna(0.0).to_numpy()
+
+    model = LinearRegression()
+    model.fit(x.reshape(-1, 1), y_filled)
+
+    future_x = np.arange(x.max() + 1, x.max() + horizon_days + 1, dtype="float64")
+    prediction = model.predict(future_x.reshape(-1, 1))
+
+    n = len(x)
+    sxx = ((x - x.mean()) ** 2).sum()
+    if n > 2 and sxx > 0:
+        residuals = y_filled - model.predict(x.reshape(-1, 1))
+        sigma = np.sqrt((residuals ** 2).sum(axis=0) / (n - 2))
+        leverage = np.sqrt(1 / n + (future_x - x.mean()) ** 2 / sxx)
+        margin = stats.t.ppf((1 + confidence) / 2, n - 2) * np.outer(leverage, sigma)
+    else:
+        margin = np.full_like(prediction, np.nan)
+
+    # Reihen ohne einen einzigen beobachteten Wert werden nicht prognostiziert
+    prediction[:, ~observed] = np.nan
+    margin[:, ~observed] = np.nan
+
+    days = np.repeat(future_x, len(SERIES))
+    return pd.DataFrame({
+        "reihe": np.tile(SERIES, len(future_x)),
+        "tag": days.astype("int64"),
+        "datum": start + pd.to_timedelta(days, unit="D"),
+        "prognose": prediction.ravel(),
+        "untere_grenze": (prediction - margin).ravel(),
+        "obere_grenze": (prediction + margin).ravel(),
+    })
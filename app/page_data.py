@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from app.db_manager import get_all_teilnehmer, get_tests_by_berufsbezeichnung, get_tests_by_teilnehmer
+from app.db_schema import shared_view
+from app.site_router import READ_POOL_SIZE, get_current_site
+
+# Gemeinsamer Thread-Pool aller Sitzungen; die Abfragen laufen über die lesenden Pool-Verbindungen
+_executor = ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix="page-prefetch")
+
+
+def _load_in_context(ctx, loader, args, site):
+    """
+    Führt eine Lesefunktion im Worker-Thread aus. Der Skriptkontext der auslösenden Sitzung wird
+    dem Thread zugeordnet, da die gecachten Lesefunktionen ihn sonst als fehlend protokollieren.
+    """
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return loader(*args, site=site)
+
+
+class PageData:
+    """
+    Datenkontext einer Seite. Die Seite deklariert zu Beginn eines Reruns, welche Datensätze sie
+    benötigt; diese werden einmal und parallel geladen. Alle Tabs greifen auf dieselben Ergebnisse zu,
+    sodass die Wartezeit etwa der längsten Einzelabfrage entspricht statt der Summe aller Abfragen.
+    Nicht deklarierte Datensätze werden beim ersten Zugriff nachgeladen.
+    """
+
+    def __init__(self, site=None):
+        # Der Standort wird im Skript-Thread bestimmt; die Worker haben keinen Zugriff auf den Session-State
+        self.site = site or get_current_site()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def request(self, loader, *args):
+        """
+        Deklariert einen Datensatz und startet das Laden im Hintergrund (höchstens einmal je Rerun).
+        Args:
+            loader (callable): Lesefunktion aus `app.db_manager` mit Parameter `site`.
+            *args: Argumente der Lesefunktion.
+        Returns:
+            concurrent.futures.Future: Ergebnis des Ladevorgangs.
+        """
+        key = (loader, args)
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = _executor.submit(_load_in_context, get_script_run_ctx(), loader, args, self.site)
+            return self._futures[key]
+
+    def get(self, loader, *args):
+        """
+        Gibt einen Datensatz zurück und wartet gegebenenfalls auf dessen Ladevorgang.
+        Jeder Zugriff erhält eine eigene Copy-on-Write-Sicht, damit Änderungen in einem Tab
+        die anderen Tabs nicht erreichen.
+        """
+        return shared_view(self.request(loader, *args).result())
+
+    def invalidate(self):
+        """
+        Verwirft alle geladenen Datensätze, z. B. nach einer Schreiboperation in einem Tab,
+        damit nachfolgende Tabs im selben Rerun den neuen Stand lesen.
+        """
+        with self._lock:
+            self._futures.clear()
+
+    def request_selected_tests(self, *session_keys):
+        """
+        Deklariert die Tests der Teilnehmer, die in den angegebenen Auswahlfeldern (Session-State-Schlüssel)
+        aus dem vorherigen Rerun ausgewählt sind.
+        """
+        for key in session_keys:
+            selected_id = st.session_state.get(key)
+            if selected_id is not None:
+                self.request(get_tests_by_teilnehmer, int(selected_id))
+
+    def teilnehmer(self):
+        """
+        Alle Teilnehmer des Standorts.
+        """
+        return self.get(get_all_teilnehmer)
+
+    def tests(self, teilnehmer_id):
+        """
+        Alle Tests eines Teilnehmers.
+        """
+        return self.get(get_tests_by_teilnehmer, int(teilnehmer_id))
+
+    def tests_by_beruf(self, berufsbezeichnung):
+        """
+        Alle Tests der Teilnehmer einer Berufsbezeichnung.
+        """
+        return self.get(get_tests_by_berufsbezeichnung, str(berufsbezeichnung))
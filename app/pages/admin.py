@@ -0,0 +1,86 @@
+import streamlit as st
+from app.db_manager import (create_database_backup, get_database_backups, restore_database_backup,
+                            export_incremental_snapshot, get_change_journal)
+from app.change_journal import EXPORT_DIR
+from datetime import datetime
+import pandas as pd
+
+# Anzahl der angezeigten Einträge des Änderungsjournals
+JOURNAL_ROWS = 200
+
+def main():
+    """
+    Hauptfunktion für administrative Aufgaben.
+    Ermöglicht das manuelle Erstellen von Sicherungen im laufenden Betrieb
+    sowie das Wiederherstellen einer vorhandenen Sicherung. Außerdem können die seit dem
+    letzten Export geänderten Zeilen als Delta-Datei exportiert werden.
+    """
+    st.header("Administration")
+    st.markdown("""
+        Sicherungen werden automatisch nach Zeitplan erstellt. Hier können Sie zusätzlich
+        eine Sicherung manuell auslösen oder eine vorhandene Sicherung wiederherstellen.
+    """)
+
+    # Sicherung erstellen
+    st.subheader("Sicherung erstellen")
+    compress = st.checkbox("Sicherung komprimieren (gzip)", value=True)
+    if st.button("Sicherung jetzt erstellen"):
+        try:
+            path = create_database_backup(compress=compress)
+            if compress:
+                # Die unkomprimierte Datei wird nach der Komprimierung im Hintergrund entfernt
+                st.success(f"Sicherung wurde erfolgreich erstellt: {path.name}.gz (wird im Hintergrund komprimiert)")
+            else:
+                st.success(f"Sicherung wurde erfolgreich erstellt: {path.name}")
+        except Exception as e:
+            st.error(f"Fehler beim Erstellen der Sicherung: {e}")
+
+    # Inkrementeller Export (Delta-Synchronisation)
+    st.subheader("Änderungen exportieren")
+    target = st.text_input(f"Exportziel (Unterordner von '{EXPORT_DIR}', leer für Standard):", value="",
+                           key="export_target")
+    if st.button("Änderungen seit dem letzten Export exportieren"):
+        try:
+            path = export_incremental_snapshot(target.strip() or None)
+            if path is None:
+                st.info("Seit dem letzten Export gibt es keine Änderungen.")
+            else:
+                st.success(f"Änderungen wurden exportiert: {path}")
+        except Exception as e:
+            st.error(f"Fehler beim Exportieren der Änderungen: {e}")
+
+    with st.expander("Änderungsjournal"):
+        since_seq = st.number_input("Ab Sequenznummer:", min_value=0, value=0, step=1, key="journal_since_seq")
+        journal = get_change_journal(since_seq, limit=JOURNAL_ROWS)
+        if journal.empty:
+            st.info("Keine Einträge vorhanden.")
+        else:
+            st.caption(f"Die neuesten {len(journal)} Einträge (höchstens {JOURNAL_ROWS}) werden angezeigt.")
+            st.dataframe(journal, use_container_width=True, hide_index=True)
+
+    # Vorhandene Sicherungen
+    st.subheader("Vorhandene Sicherungen")
+    backups = get_database_backups()
+    if not backups:
+        st.info("Es sind noch keine Sicherungen vorhanden.")
+        return
+
+    st.dataframe(pd.DataFrame({
+        "Datei": [p.name for p in backups],
+        "Größe (KB)": [round(p.stat().st_size / 1024, 1) for p in backups],
+        "Erstellt": [datetime.fromtimestamp(p.stat().st_mtime).strftime('%d.%m.%Y %H:%M:%S') for p in backups],
+    }), use_container_width=True)
+
+    # Sicherung wiederherstellen
+    st.subheader("Sicherung wiederherstellen")
+    selected_backup = st.selectbox("Sicherung auswählen:", backups, format_func=lambda p: p.name)
+    confirm = st.checkbox("Ich bestätige, dass die aktuellen Daten überschrieben werden.")
+    if st.button("Sicherung wiederherstellen", disabled=not confirm):
+        try:
+            counts = restore_database_backup(selected_backup)
+            st.success(f"Sicherung wurde erfolgreich wiederhergestellt und überprüft: {counts}")
+        except Exception as e:
+            st.error(f"Fehler beim Wiederherstellen der Sicherung: {e}")
+
+if __name__ == "__main__":
+    main()
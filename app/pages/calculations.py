@@ -1,8 +1,14 @@
 import streamlit as st
-from app.db_manager import get_tests_by_teilnehmer
+from app.db_manager import (get_tests_by_teilnehmer, get_all_teilnehmer, get_federated_cohort_statistics,
+                            get_test_review_queue, mark_reviews_done)
+from app.anomaly_detection import PRUEFUNGEN
+from app.site_router import FEDERATED_GROUP_COLUMNS
 from app.utils.helper_functions import sort_dataframe_by_date
 import pandas as pd
 
+# Standortübergreifende Statistiken werden höchstens alle fünf Minuten neu berechnet
+FEDERATED_STATS_TTL_SECONDS = 300
+
 def main():
     """
     Hauptfunktion für automatische Berechnungen und Validierung.
@@ -15,6 +21,26 @@ def main():
         um die Ergebnisse anzuzeigen.
     """)
 
+    # Standortübergreifende Kohortenstatistik
+    with st.expander("Standortübergreifende Kohortenstatistik"):
+        group_by = st.selectbox(
+            "Gruppieren nach:",
+            FEDERATED_GROUP_COLUMNS,
+            format_func=lambda x: x.capitalize(),
+            key="federated_group_by"
+        )
+        if st.button("Neu berechnen", key="federated_refresh"):
+            cached_federated_statistics.clear()
+        df_cohort = cached_federated_statistics(group_by)
+        if df_cohort.empty:
+            st.info("Es liegen an keinem Standort Testdaten vor.")
+        else:
+            st.dataframe(df_cohort, use_container_width=True)
+
+    # Prüfliste auffälliger Tests (wird bei jeder Testeingabe und jedem Massenimport befüllt)
+    with st.expander("Prüfliste auffälliger Tests"):
+        review_queue()
+
     teilnehmer_data = get_all_teilnehmer()
     
     if teilnehmer_data.empty:
@@ -72,5 +98,49 @@ def main():
     st.subheader("Visualisierung der Testergebnisse")
     st.line_chart(data=df_tests_sorted.set_index("test_datum")["gesamt_prozent"])
 
+@st.cache_data(ttl=FEDERATED_STATS_TTL_SECONDS, show_spinner=False)
+def cached_federated_statistics(group_by):
+    """
+    Standortübergreifende Kohortenstatistik, zwischengespeichert je Gruppierungsspalte.
+    Ohne Cache würde jeder Rerun der Seite alle Standorte abfragen.
+    """
+    return get_federated_cohort_statistics(group_by)
+
+def review_queue():
+    """
+    Zeigt die offenen Einträge der Prüfliste an und ermöglicht es, sie als geprüft zu markieren.
+    """
+    df_queue = get_test_review_queue()
+    if df_queue.empty:
+        st.info("Keine offenen Auffälligkeiten.")
+        return
+
+    df_anzeige = df_queue.assign(
+        pruefung=df_queue['pruefung'].map(PRUEFUNGEN).fillna(df_queue['pruefung']),
+        test_datum=pd.to_datetime(df_queue['test_datum']).dt.strftime('%d.%m.%Y'),
+        erledigt=False,
+    )
+    edited = st.data_editor(
+        df_anzeige[['erledigt', 'review_id', 'name', 'test_id', 'test_datum', 'pruefung', 'details']],
+        column_config={
+            "erledigt": st.column_config.CheckboxColumn("Geprüft"),
+            "review_id": None,
+            "name": "Teilnehmer",
+            "test_id": "Test",
+            "test_datum": "Testdatum",
+            "pruefung": "Auffälligkeit",
+            "details": "Details",
+        },
+        disabled=['name', 'test_id', 'test_datum', 'pruefung', 'details'],
+        hide_index=True, use_container_width=True, key="review_queue_editor"
+    )
+    done = edited.loc[edited['erledigt'], 'review_id'].tolist()
+    if st.button("Als geprüft markieren", disabled=not done, key="review_done_button"):
+        try:
+            mark_reviews_done(done)
+            st.success(f"{len(done)} Einträge als geprüft markiert.")
+        except Exception as e:
+            st.error(f"Fehler beim Aktualisieren der Prüfliste: {e}")
+
 if __name__ == "__main__":
     main()
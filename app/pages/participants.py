@@ -1,6 +1,8 @@
 import streamlit as st
-from app.db_manager import add_teilnehmer, get_all_teilnehmer, update_teilnehmer, delete_teilnehmer
-from app.utils.helper_functions import validate_sv_nummer, validate_dates, calculate_status, format_date
+from app.db_manager import (add_teilnehmer, get_all_teilnehmer, update_teilnehmer, delete_teilnehmer,
+                            get_duplicate_participants, get_similar_participants, merge_teilnehmer)
+from app.page_data import PageData
+from app.utils.helper_functions import validate_sv_nummer, validate_dates, calculate_status
 import pandas as pd
 
 def main():
@@ -10,28 +12,32 @@ def main():
     - Übersicht
     - Teilnehmer hinzufügen
     - Teilnehmer bearbeiten/löschen
+    - Dubletten prüfen und zusammenführen
     """
 
     st.header("Teilnehmerverwaltung")
-    tabs = st.tabs(["Übersicht", "Teilnehmer hinzufügen", "Teilnehmer bearbeiten/löschen"])
+    # Teilnehmer einmal je Rerun laden und in allen Tabs verwenden
+    data = PageData()
+    data.request(get_all_teilnehmer)
+    tabs = st.tabs(["Übersicht", "Teilnehmer hinzufügen", "Teilnehmer bearbeiten/löschen", "Dubletten"])
 
     # Tab: Übersicht
     with tabs[0]:
         st.subheader("Alle Teilnehmer anzeigen")
-        df_teilnehmer = get_all_teilnehmer()
+        df_teilnehmer = data.teilnehmer()
 
         if df_teilnehmer.empty:
             st.info("Keine Teilnehmer vorhanden. Bitte fügen Sie zuerst Teilnehmer hinzu.")
         else:
-            # Formatieren der Datumsfelder
-            df_teilnehmer['Eintrittsdatum'] = df_teilnehmer['eintrittsdatum'].apply(format_date)
-            df_teilnehmer['Austrittsdatum'] = df_teilnehmer['austrittsdatum'].apply(
-                lambda x: format_date(x) if x else "Nicht angegeben"
+            # Formatieren der Datumsfelder (auf einer Anzeigekopie, der gecachte DataFrame bleibt unverändert)
+            df_anzeige = df_teilnehmer.assign(
+                Eintrittsdatum=df_teilnehmer['eintrittsdatum'].dt.strftime('%d.%m.%Y'),
+                Austrittsdatum=df_teilnehmer['austrittsdatum'].dt.strftime('%d.%m.%Y').fillna("Nicht angegeben")
             )
             # Teilnehmer anzeigen
             st.dataframe(
-                df_teilnehmer[['teilnehmer_id', 'name', 'sv_nummer', 'geschlecht', 'Eintrittsdatum', 'Austrittsdatum',
-                               'berufsbezeichnung', 'status']].set_index('teilnehmer_id'),
+                df_anzeige[['teilnehmer_id', 'name', 'sv_nummer', 'geschlecht', 'Eintrittsdatum', 'Austrittsdatum',
+                            'berufsbezeichnung', 'status']].set_index('teilnehmer_id'),
                 use_container_width=True
             )
             # Schalter für inaktive Teilnehmer
@@ -67,22 +73,34 @@ def main():
                             berufsbezeichnung=berufsbezeichnung,
                             status=status_calculated
                         )
+                        data.invalidate()
                         st.success(f"Teilnehmer '{name}' wurde erfolgreich hinzugefügt.")
+                        similar = get_similar_participants(name, sv_nummer, geschlecht)
+                        similar = similar[similar['sv_nummer'] != sv_nummer]
+                        if not similar.empty:
+                            st.warning("Mögliche Dubletten gefunden: " + ", ".join(
+                                f"{row.name} ({row.sv_nummer})" for row in similar.itertuples()
+                            ) + ". Bitte im Tab 'Dubletten' prüfen.")
                     except Exception as e:
                         st.error(f"Fehler beim Hinzufügen des Teilnehmers: {e}")
 
     # Tab: Teilnehmer bearbeiten/löschen
     with tabs[2]:
         st.subheader("Teilnehmer bearbeiten oder löschen")
-        df_teilnehmer = get_all_teilnehmer()
+        df_teilnehmer = data.teilnehmer()
 
         if df_teilnehmer.empty:
             st.info("Keine Teilnehmer vorhanden. Bitte fügen Sie zuerst Teilnehmer hinzu.")
         else:
-            teilnehmer_namen = df_teilnehmer['name'].tolist()
-            selected_name = st.selectbox("Wählen Sie einen Teilnehmer aus:", teilnehmer_namen, key="edit_selectbox")
-            teilnehmer_data = df_teilnehmer[df_teilnehmer['name'] == selected_name].iloc[0]
-            teilnehmer_id = teilnehmer_data['teilnehmer_id']
+            # Auswahl über die ID, damit gleichnamige Teilnehmer unterscheidbar bleiben
+            teilnehmer_index = df_teilnehmer.set_index('teilnehmer_id')
+            teilnehmer_id = int(st.selectbox(
+                "Wählen Sie einen Teilnehmer aus:", teilnehmer_index.index.astype(int).tolist(),
+                format_func=lambda x: f"{teilnehmer_index.at[x, 'name']} ({teilnehmer_index.at[x, 'sv_nummer']})",
+                key="edit_selectbox"
+            ))
+            teilnehmer_data = teilnehmer_index.loc[teilnehmer_id]
+            selected_name = teilnehmer_data['name']
 
             with st.expander("Teilnehmerdaten bearbeiten"):
                 with st.form("edit_participant_form"):
@@ -93,10 +111,10 @@ def main():
                         ["Männlich", "Weiblich", "Divers"],
                         index=["Männlich", "Weiblich", "Divers"].index(teilnehmer_data['geschlecht'])
                     )
-                    eintrittsdatum = st.date_input("Eintrittsdatum:", value=pd.to_datetime(teilnehmer_data['eintrittsdatum']))
+                    eintrittsdatum = st.date_input("Eintrittsdatum:", value=teilnehmer_data['eintrittsdatum'])
                     austrittsdatum = st.date_input(
                         "Austrittsdatum (optional):", 
-                        value=pd.to_datetime(teilnehmer_data['austrittsdatum']) if teilnehmer_data['austrittsdatum'] else None
+                        value=teilnehmer_data['austrittsdatum'] if pd.notna(teilnehmer_data['austrittsdatum']) else None
                     )
                     berufsbezeichnung = st.text_input("Berufsbezeichnung:", value=teilnehmer_data['berufsbezeichnung'], max_chars=100)
                     submitted_edit = st.form_submit_button("Änderungen speichern")
@@ -131,5 +149,57 @@ def main():
                     except Exception as e:
                         st.error(f"Fehler beim Löschen des Teilnehmers: {e}")
 
+    # Tab: Dubletten
+    with tabs[3]:
+        review_duplicates()
+
+def review_duplicates():
+    """
+    Sucht mögliche Dubletten und ermöglicht das Zusammenführen zweier Teilnehmer.
+    Die Tests des entfernten Teilnehmers werden dabei dem verbleibenden Teilnehmer zugeordnet.
+    """
+    st.subheader("Mögliche Dubletten")
+    threshold = st.slider("Mindestähnlichkeit", min_value=0.5, max_value=1.0, value=0.75, step=0.05,
+                          key="duplicate_threshold")
+    if st.button("Dubletten suchen", key="find_duplicates_button"):
+        st.session_state["duplicate_pairs"] = get_duplicate_participants(threshold)
+
+    pairs = st.session_state.get("duplicate_pairs")
+    if pairs is None:
+        return
+    if pairs.empty:
+        st.info("Keine möglichen Dubletten gefunden.")
+        return
+
+    st.dataframe(
+        pairs[['id_a', 'name_a', 'sv_nummer_a', 'anzahl_tests_a', 'id_b', 'name_b', 'sv_nummer_b', 'anzahl_tests_b',
+               'score']].round({'score': 2}),
+        hide_index=True, use_container_width=True
+    )
+
+    pair_index = st.selectbox(
+        "Paar zum Zusammenführen:", pairs.index.tolist(),
+        format_func=lambda i: f"{pairs.at[i, 'name_a']} ({pairs.at[i, 'id_a']}) / "
+                              f"{pairs.at[i, 'name_b']} ({pairs.at[i, 'id_b']})",
+        key="merge_pair"
+    )
+    pair = pairs.loc[pair_index]
+    keep_side = st.radio(
+        "Welcher Datensatz bleibt erhalten?", ["a", "b"], horizontal=True, key="merge_keep_side",
+        format_func=lambda side: f"{pair[f'name_{side}']} ({pair[f'sv_nummer_{side}']}, "
+                                 f"{pair[f'anzahl_tests_{side}']} Tests)"
+    )
+    drop_side = "b" if keep_side == "a" else "a"
+    confirm = st.checkbox(
+        f"'{pair[f'name_{drop_side}']}' wird gelöscht, seine Tests werden übernommen.", key="merge_confirm"
+    )
+    if st.button("Teilnehmer zusammenführen", disabled=not confirm, key="merge_button"):
+        try:
+            moved = merge_teilnehmer(int(pair[f'id_{keep_side}']), int(pair[f'id_{drop_side}']))
+            st.session_state.pop("duplicate_pairs", None)
+            st.success(f"Teilnehmer zusammengeführt, {moved} Tests übernommen.")
+        except Exception as e:
+            st.error(f"Fehler beim Zusammenführen der Teilnehmer: {e}")
+
 if __name__ == "__main__":
     main()
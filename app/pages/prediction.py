@@ -1,5 +1,6 @@
 import streamlit as st
-from app.db_manager import get_tests_by_teilnehmer, get_all_teilnehmer
+from app.db_manager import get_tests_by_teilnehmer, get_all_teilnehmer, get_cohort_risk_scores
+from app.forecasting import FORECAST_HORIZON_DAYS, forecast_category_trends
 from sklearn.linear_model import LinearRegression
 import pandas as pd
 import numpy as np
@@ -23,6 +24,9 @@ def main():
         st.info("Keine Teilnehmerdaten vorhanden. Bitte fügen Sie Teilnehmer hinzu.")
         return
 
+    with st.expander("Risikoanalyse der Kohorte"):
+        cohort_risk_analysis(teilnehmer_data)
+
     selected_id = st.selectbox(
         "Wählen Sie einen Teilnehmer aus:",
         teilnehmer_data['teilnehmer_id'],
@@ -71,6 +75,86 @@ def main():
         plt.legend()
         st.pyplot(plt)
 
+    # Prognose je Kategorie (eine Mehrfachausgabe-Regression für alle Kategorien und den Gesamtwert)
+    st.subheader("Prognose je Kategorie")
+    if st.button("Kategorien prognostizieren", key="forecast_categories_button"):
+        forecast = cached_category_forecast(int(selected_id), df_tests)
+        show_category_forecast(df_tests_sorted, forecast)
+
+@st.cache_data(max_entries=256)
+def cached_category_forecast(teilnehmer_id, df_tests, horizon_days=FORECAST_HORIZON_DAYS):
+    """
+    Prognose je Kategorie, zwischengespeichert pro Teilnehmer. Da die Testdaten Teil des
+    Cache-Schlüssels sind, wird nach einer Änderung an den Tests automatisch neu gerechnet.
+    """
+    return forecast_category_trends(df_tests, horizon_days)
+
+def show_category_forecast(df_tests_sorted, forecast):
+    """
+    Zeichnet die bisherigen Verläufe und die Prognosen mit Konfidenzintervall für alle Kategorien.
+    Args:
+        df_tests_sorted (pandas.DataFrame): Nach Datum sortierte Tests mit 'days_since_start'.
+        forecast (pandas.DataFrame): Ergebnis von `forecast_category_trends`.
+    """
+    history = df_tests_sorted.set_index("days_since_start")
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for reihe, part in forecast.groupby("reihe", sort=False):
+        if reihe == "gesamt":
+            observed = history["gesamt_prozent"]
+        else:
+            observed = history[f"{reihe}_erreichte_punkte"] / history[f"{reihe}_max_punkte"].where(
+                history[f"{reihe}_max_punkte"] > 0) * 100
+        line, = ax.plot(observed.index, observed.values, marker='o', label=reihe.capitalize())
+        ax.plot(part["tag"], part["prognose"], linestyle='--', color=line.get_color())
+        ax.fill_between(part["tag"], part["untere_grenze"], part["obere_grenze"], color=line.get_color(), alpha=0.15)
+    ax.set_xlabel("Tage seit erstem Test")
+    ax.set_ylabel("Prozent (%)")
+    ax.set_title("Prognostizierte Entwicklung je Kategorie (95%-Konfidenzintervall)")
+    ax.legend()
+    st.pyplot(fig)
+    plt.close(fig)
+
+    final = forecast[forecast["tag"] == forecast["tag"].max()].set_index("reihe")
+    st.dataframe(
+        final[["datum", "prognose", "untere_grenze", "obere_grenze"]].round(1).rename(index=str.capitalize),
+        column_config={"datum": st.column_config.DateColumn("Datum", format="DD.MM.YYYY")},
+    )
+
+def cohort_risk_analysis(teilnehmer_data):
+    """
+    Bewertet alle Teilnehmer mit einem kohortenweiten Klassifikator und zeigt diejenigen an,
+    die den Zielwert voraussichtlich verfehlen.
+    Args:
+        teilnehmer_data (pandas.DataFrame): Alle Teilnehmer.
+    """
+    st.markdown("""
+        Das Modell wird auf den Testverläufen aller Teilnehmer trainiert (Steigungen je Kategorie,
+        letzte Ergebnisse, Testhäufigkeit, Betriebszugehörigkeit) und bewertet die gesamte Kohorte auf einmal.
+    """)
+    target = st.number_input("Zielwert Gesamtprozent (%)", min_value=0.0, max_value=100.0, value=60.0, step=5.0,
+                             key="risk_target_percent")
+    if not st.button("Kohorte bewerten", key="risk_score_button"):
+        return
+
+    try:
+        scores = get_cohort_risk_scores(target)
+    except ValueError as e:
+        st.warning(f"Das Risikomodell kann nicht trainiert werden: {e}")
+        return
+
+    result = scores.merge(
+        teilnehmer_data[["teilnehmer_id", "name", "berufsbezeichnung", "status"]].astype({"teilnehmer_id": "int64"}),
+        on="teilnehmer_id",
+    ).sort_values("risiko", ascending=False)
+    result["gefährdet"] = result["risiko"] >= 0.5
+    st.write(f"{int(result['gefährdet'].sum())} von {len(result)} Teilnehmern verfehlen "
+             f"den Zielwert von {target:.0f}% voraussichtlich.")
+    st.dataframe(
+        result.assign(risiko=(result["risiko"] * 100).round(1)),
+        column_config={"risiko": st.column_config.NumberColumn("Risiko (%)")},
+        hide_index=True,
+    )
+
 def train_model(x, y):
     """
     Trainiert ein einfaches lineares Regressionsmodell basierend auf den gegebenen Daten.
@@ -1,13 +1,20 @@
 import streamlit as st
-from app.db_manager import get_tests_by_teilnehmer, get_all_teilnehmer
+from app.db_manager import get_tests_by_teilnehmer, get_all_teilnehmer, get_tests_by_berufsbezeichnung
 from app.utils.helper_functions import sort_dataframe_by_date, calculate_age
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from openpyxl import Workbook
+from app.utils.report_cache import report_cache_key, get_or_render
+from io import BytesIO
+from datetime import datetime
+from functools import partial
 import pandas as pd
 import os
 
+# Version der Berichtsvorlagen; bei Layoutänderungen erhöhen, damit gecachte Berichte neu erzeugt werden
+REPORT_TEMPLATE_VERSION = "1"
+
 def main():
     """
     Hauptfunktion zur Erstellung von Berichten in PDF- und Excel-Format.
@@ -25,6 +32,21 @@ def main():
         st.info("Keine Teilnehmerdaten vorhanden. Bitte fügen Sie Teilnehmer hinzu.")
         return
 
+    # Kursbericht: alle Teilnehmer einer Berufsbezeichnung in einem PDF
+    with st.expander("Kursbericht als Sammel-PDF"):
+        beruf = st.selectbox("Kurs (Berufsbezeichnung) auswählen:",
+                             sorted(teilnehmer_data['berufsbezeichnung'].dropna().unique()),
+                             key="select_report_course")
+        if st.button("Kursbericht erstellen"):
+            with st.spinner("Kursbericht wird erstellt..."):
+                booklet = generate_cohort_booklet(
+                    beruf,
+                    teilnehmer_data[teilnehmer_data['berufsbezeichnung'] == beruf],
+                    get_tests_by_berufsbezeichnung(beruf)
+                )
+            st.download_button("Kursbericht herunterladen", booklet,
+                               file_name=f"{beruf}-Kursbericht.pdf", mime="application/pdf")
+
     selected_id = st.selectbox(
         "Wählen Sie einen Teilnehmer aus:",
         teilnehmer_data['teilnehmer_id'],
@@ -47,34 +69,88 @@ def main():
     st.write(f"**Status:** {selected_participant['status']}")
 
     # Testdaten vorbereiten
-    df_tests_sorted = sort_dataframe_by_date(df_tests, "test_datum")
-    df_tests_sorted['test_datum'] = df_tests_sorted['test_datum'].apply(lambda x: x.strftime('%d.%m.%Y'))
+    df_tests_sorted = prepare_test_data(df_tests)
 
     # Bericht exportieren
     col1, col2 = st.columns(2)
 
     with col1:
         if st.button("Bericht als PDF exportieren"):
-            pdf_path = generate_pdf_report(selected_participant, df_tests_sorted)
-            st.success(f"PDF-Bericht wurde erfolgreich erstellt: {pdf_path}")
+            pdf_bytes = generate_pdf_report(selected_participant, df_tests_sorted)
+            st.success("PDF-Bericht wurde erfolgreich erstellt.")
+            st.download_button("PDF-Bericht herunterladen", pdf_bytes,
+                               file_name=f"{selected_participant['name']}-Bericht.pdf", mime="application/pdf")
 
     with col2:
         if st.button("Bericht als Excel exportieren"):
-            excel_path = generate_excel_report(selected_participant, df_tests_sorted)
-            st.success(f"Excel-Bericht wurde erfolgreich erstellt: {excel_path}")
+            excel_bytes = generate_excel_report(selected_participant, df_tests_sorted)
+            st.success("Excel-Bericht wurde erfolgreich erstellt.")
+            st.download_button("Excel-Bericht herunterladen", excel_bytes,
+                               file_name=f"{selected_participant['name']}-Bericht.xlsx",
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+def prepare_test_data(df_tests):
+    """
+    Sortiert die Tests eines Teilnehmers nach Datum und formatiert das Datum für den Bericht.
+    Args:
+        df_tests (DataFrame): Testergebnisse eines Teilnehmers.
+    Returns:
+        DataFrame: Aufbereitete Testdaten.
+    """
+    df_tests_sorted = sort_dataframe_by_date(df_tests, "test_datum")
+    df_tests_sorted['test_datum'] = df_tests_sorted['test_datum'].apply(lambda x: x.strftime('%d.%m.%Y'))
+    return df_tests_sorted
+
+def _report_key(participant, test_data):
+    """
+    Inhaltsbasierter Cache-Schlüssel aus Teilnehmerdaten, Testdaten, Vorlagenversion und berechnetem Alter.
+    """
+    return report_cache_key(participant, test_data, REPORT_TEMPLATE_VERSION,
+                            extra={"alter": calculate_age(participant['sv_nummer'])})
 
 def generate_pdf_report(participant, test_data):
     """
     Generiert einen PDF-Bericht für einen Teilnehmer.
+    Unveränderte Berichte werden aus dem Bericht-Cache geliefert, ohne sie neu zu erzeugen.
     Args:
         participant (dict): Informationen über den Teilnehmer.
         test_data (DataFrame): Testergebnisse des Teilnehmers.
     Returns:
-        str: Pfad zur generierten PDF-Datei.
+        bytes: Inhalt der PDF-Datei.
+    """
+    return get_or_render(_report_key(participant, test_data), ".pdf",
+                         lambda: _render_pdf_report(participant, test_data))
+
+def generate_excel_report(participant, test_data):
+    """
+    Generiert einen Excel-Bericht für einen Teilnehmer.
+    Unveränderte Berichte werden aus dem Bericht-Cache geliefert, ohne sie neu zu erzeugen.
+    Args:
+        participant (dict): Informationen über den Teilnehmer.
+        test_data (DataFrame): Testergebnisse des Teilnehmers.
+    Returns:
+        bytes: Inhalt der Excel-Datei.
+    """
+    return get_or_render(_report_key(participant, test_data), ".xlsx",
+                         lambda: _render_excel_report(participant, test_data))
+
+def _render_pdf_report(participant, test_data):
+    """
+    Erzeugt den PDF-Bericht für einen Teilnehmer.
+    Returns:
+        bytes: Inhalt der PDF-Datei.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer)
+    doc.build(_pdf_report_story(participant, test_data, getSampleStyleSheet()))
+    return buffer.getvalue()
+
+def _pdf_report_story(participant, test_data, styles):
+    """
+    Baut die Inhalte (Flowables) des PDF-Berichts eines Teilnehmers, auch für den Kursbericht.
+    Returns:
+        list: Flowables für `SimpleDocTemplate.build`.
     """
-    pdf_path = f"{participant['name']}-Bericht.pdf"
-    doc = SimpleDocTemplate(pdf_path)
-    styles = getSampleStyleSheet()
     story = []
 
     # Teilnehmerinformationen
@@ -104,21 +180,14 @@ def generate_pdf_report(participant, test_data):
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
     ]))
     story.append(table)
+    return story
 
-    # PDF speichern
-    doc.build(story)
-    return pdf_path
-
-def generate_excel_report(participant, test_data):
+def _render_excel_report(participant, test_data):
     """
-    Generiert einen Excel-Bericht für einen Teilnehmer.
-    Args:
-        participant (dict): Informationen über den Teilnehmer.
-        test_data (DataFrame): Testergebnisse des Teilnehmers.
+    Erzeugt den Excel-Bericht für einen Teilnehmer.
     Returns:
-        str: Pfad zur generierten Excel-Datei.
+        bytes: Inhalt der Excel-Datei.
     """
-    excel_path = f"{participant['name']}-Bericht.xlsx"
     wb = Workbook()
     ws = wb.active
     ws.title = "Bericht"
@@ -139,9 +208,134 @@ def generate_excel_report(participant, test_data):
             f"{row['gesamt_prozent']:.2f}%"
         ])
 
-    # Excel speichern
-    wb.save(excel_path)
-    return excel_path
+    # Excel erzeugen
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+class _Bookmark(Flowable):
+    """
+    Unsichtbares Flowable, das an seiner Position ein Lesezeichen (Gliederungseintrag) setzt.
+    """
+
+    def __init__(self, key, title, level=0):
+        super().__init__()
+        self.key = key
+        self.title = title
+        self.level = level
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=self.level)
+
+class _DeferredSection:
+    """
+    Platzhalter in der Story des Kursberichts, der seine Flowables erst beim Setzen erzeugt.
+    """
+
+    def __init__(self, build, *args):
+        self.build = partial(build, *args)
+
+class _BookletDocTemplate(SimpleDocTemplate):
+    """
+    Dokumentvorlage des Kursberichts, die Platzhalter (`_DeferredSection`) beim Setzen
+    durch ihre Flowables ersetzt.
+    """
+
+    def filterFlowables(self, flowables):
+        while flowables and isinstance(flowables[0], _DeferredSection):
+            flowables[0:1] = flowables[0].build()
+
+def generate_cohort_booklet(course_name, participants, tests):
+    """
+    Erstellt einen Kursbericht: Deckblatt, Kohortenübersicht und die Berichte aller Teilnehmer
+    mit Lesezeichen je Teilnehmer, als ein einziges reportlab-Dokument.
+    Die Flowables eines Teilnehmers werden erst erzeugt, wenn sein Abschnitt gesetzt wird, und danach
+    wieder freigegeben. Der Speicherbedarf ist dennoch nicht konstant: reportlab hält die Inhalte aller
+    Seiten bis zum Schreiben des Dokuments (gemessen etwa 8 KB je Seite; rund 14 MB Spitze für
+    1.200 Teilnehmer bei 1,6 MB PDF-Größe). Er wächst also linear mit der Seitenzahl.
+    Args:
+        course_name (str): Name des Kurses (Berufsbezeichnung).
+        participants (DataFrame): Teilnehmer des Kurses.
+        tests (DataFrame): Testergebnisse aller Teilnehmer des Kurses.
+    Returns:
+        bytes: Inhalt der PDF-Datei.
+    """
+    participants = participants.sort_values('name')
+    # Nur Zeilenpositionen je Teilnehmer vorhalten; die Teil-DataFrames entstehen erst beim Setzen
+    test_positions = tests.groupby('teilnehmer_id', observed=True).indices
+    styles = getSampleStyleSheet()
+
+    def participant_section(row, positions, first):
+        participant = participants.iloc[row]
+        participant_tests = tests.iloc[positions]
+        section = [PageBreak()]
+        if first:
+            section.append(_Bookmark("teilnehmer", "Teilnehmer"))
+        section.append(_Bookmark(f"teilnehmer_{int(participant['teilnehmer_id'])}", participant['name'], level=1))
+        return section + _pdf_report_story(participant, prepare_test_data(participant_tests), styles)
+
+    story = [_Bookmark("deckblatt", "Deckblatt"), *_booklet_cover_story(course_name, participants, styles),
+             PageBreak(), _Bookmark("kohorte", "Kohortenübersicht"),
+             *_cohort_summary_story(participants, tests, styles)]
+    first = True
+    for row, teilnehmer_id in enumerate(participants['teilnehmer_id']):
+        positions = test_positions.get(teilnehmer_id)
+        if positions is None or len(positions) == 0:
+            continue
+        story.append(_DeferredSection(participant_section, row, positions, first))
+        first = False
+
+    buffer = BytesIO()
+    doc = _BookletDocTemplate(buffer, title=f"Kursbericht: {course_name}")
+    doc.build(story)
+    return buffer.getvalue()
+
+def _booklet_cover_story(course_name, participants, styles):
+    """
+    Baut das Deckblatt des Kursberichts.
+    Returns:
+        list: Flowables für `SimpleDocTemplate.build`.
+    """
+    return [
+        Paragraph(f"Kursbericht: {course_name}", styles['Title']),
+        Paragraph(f"Erstellt am: {datetime.now().strftime('%d.%m.%Y')}", styles['Normal']),
+        Paragraph(f"Anzahl Teilnehmer: {len(participants)}", styles['Normal']),
+    ]
+
+def _cohort_summary_story(participants, tests, styles):
+    """
+    Baut die Kohortenübersicht mit Anzahl Tests, Durchschnitt und letztem Ergebnis je Teilnehmer.
+    Returns:
+        list: Flowables für `SimpleDocTemplate.build`.
+    """
+    summary = tests.sort_values('test_datum').groupby('teilnehmer_id', observed=True)['gesamt_prozent'].agg(
+        anzahl='count', durchschnitt='mean', letzter='last'
+    )
+    data = [["Name", "Status", "Tests", "Durchschnitt", "Letzter Test"]]
+    for _, participant in participants.iterrows():
+        teilnehmer_id = participant['teilnehmer_id']
+        if teilnehmer_id in summary.index:
+            row = summary.loc[teilnehmer_id]
+            data.append([participant['name'], participant['status'], int(row['anzahl']),
+                         f"{row['durchschnitt']:.2f}%", f"{row['letzter']:.2f}%"])
+        else:
+            data.append([participant['name'], participant['status'], 0, "-", "-"])
+
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    return [Paragraph("Kohortenübersicht", styles['Title']), table]
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,11 @@
 import streamlit as st
-from app.db_manager import add_test, get_tests_by_teilnehmer, update_test, delete_test, get_all_teilnehmer
-from app.utils.helper_functions import validate_points, calculate_total_scores, sort_dataframe_by_date, format_date
+from app.db_manager import (add_test, delete_test, get_all_teilnehmer, get_tests_by_berufsbezeichnung,
+                            apply_test_changes)
+from app.page_data import PageData
+from app.anomaly_detection import PRUEFUNGEN
+from app.db_schema import KATEGORIEN, TEST_VALUE_COLUMNS
+from app.utils.helper_functions import (validate_points, calculate_total_scores, sort_dataframe_by_date,
+                                        recalculate_totals, validate_test_rows, diff_test_frames)
 import pandas as pd
 from datetime import datetime
 
@@ -11,15 +16,24 @@ def main():
     - Übersicht der Tests
     - Hinzufügen neuer Tests
     - Bearbeiten oder Löschen bestehender Tests
+    - Bearbeiten mehrerer Tests in einer Tabelle
     """
 
     st.header("Testverwaltung")
-    tabs = st.tabs(["Übersicht", "Test hinzufügen", "Test bearbeiten/löschen"])
+
+    # Alle Tabs werden bei jedem Rerun ausgeführt: Daten einmal und parallel vorab laden
+    data = PageData()
+    data.request(get_all_teilnehmer)
+    data.request_selected_tests("overview_teilnehmer", "edit_test_teilnehmer", "bulk_teilnehmer")
+    if st.session_state.get("bulk_scope") == "Kohorte (Berufsbezeichnung)" and st.session_state.get("bulk_beruf"):
+        data.request(get_tests_by_berufsbezeichnung, str(st.session_state["bulk_beruf"]))
+
+    tabs = st.tabs(["Übersicht", "Test hinzufügen", "Test bearbeiten/löschen", "Tests im Raster bearbeiten"])
 
     # Tab: Übersicht
     with tabs[0]:
         st.subheader("Alle Tests anzeigen")
-        teilnehmer = get_all_teilnehmer()
+        teilnehmer = data.teilnehmer()
 
         if teilnehmer.empty:
             st.info("Es sind keine Teilnehmer vorhanden. Bitte fügen Sie Teilnehmer hinzu.")
@@ -27,21 +41,22 @@ def main():
             selected_id = st.selectbox(
                 "Wählen Sie einen Teilnehmer aus:",
                 teilnehmer['teilnehmer_id'],
-                format_func=lambda x: teilnehmer[teilnehmer['teilnehmer_id'] == x]['name'].values[0]
+                format_func=lambda x: teilnehmer[teilnehmer['teilnehmer_id'] == x]['name'].values[0],
+                key="overview_teilnehmer"
             )
 
-            df_tests = get_tests_by_teilnehmer(selected_id)
+            df_tests = data.tests(selected_id)
             if df_tests.empty:
                 st.info("Keine Tests für diesen Teilnehmer verfügbar.")
             else:
                 df_tests_sorted = sort_dataframe_by_date(df_tests, "test_datum")
-                df_tests_sorted['test_datum'] = df_tests_sorted['test_datum'].apply(format_date)
+                df_tests_sorted['test_datum'] = df_tests_sorted['test_datum'].dt.strftime('%d.%m.%Y')
                 st.dataframe(df_tests_sorted[['test_id', 'test_datum', 'gesamt_erreichte_punkte', 'gesamt_prozent']])
 
     # Tab: Test hinzufügen
     with tabs[1]:
         st.subheader("Neuen Test hinzufügen")
-        teilnehmer = get_all_teilnehmer()
+        teilnehmer = data.teilnehmer()
 
         if teilnehmer.empty:
             st.info("Es sind keine Teilnehmer vorhanden. Bitte fügen Sie Teilnehmer hinzu.")
@@ -49,7 +64,8 @@ def main():
             selected_id = st.selectbox(
                 "Teilnehmer auswählen:",
                 teilnehmer['teilnehmer_id'],
-                format_func=lambda x: teilnehmer[teilnehmer['teilnehmer_id'] == x]['name'].values[0]
+                format_func=lambda x: teilnehmer[teilnehmer['teilnehmer_id'] == x]['name'].values[0],
+                key="add_test_teilnehmer"
             )
 
             with st.form("add_test_form"):
@@ -66,17 +82,20 @@ def main():
                         gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent = calculate_total_scores({
                             k: {'erreicht': erreichte_punkte[k], 'max': maximale_punkte[k]} for k in erreichte_punkte
                         })
-                        add_test(selected_id, test_datum, **{
-                            f"{key}_erreichte_punkte": erreichte_punkte[key],
-                            f"{key}_max_punkte": maximale_punkte[key]
-                            for key in categories
+                        findings = add_test(selected_id, test_datum, **{
+                            **{f"{key}_erreichte_punkte": erreichte_punkte[key] for key in categories},
+                            **{f"{key}_max_punkte": maximale_punkte[key] for key in categories}
                         }, gesamt_erreichte_punkte=gesamt_erreichte_punkte, gesamt_max_punkte=gesamt_max_punkte, gesamt_prozent=gesamt_prozent)
+                        data.invalidate()
                         st.success("Test erfolgreich hinzugefügt.")
+                        if findings:
+                            st.warning("Der Test wurde zur Prüfung vorgemerkt: "
+                                       + "; ".join(PRUEFUNGEN[pruefung] for pruefung, _ in findings) + ".")
 
     # Tab: Test bearbeiten/löschen
     with tabs[2]:
         st.subheader("Tests bearbeiten oder löschen")
-        teilnehmer = get_all_teilnehmer()
+        teilnehmer = data.teilnehmer()
 
         if teilnehmer.empty:
             st.info("Keine Teilnehmer vorhanden.")
@@ -84,17 +103,118 @@ def main():
             selected_id = st.selectbox(
                 "Teilnehmer auswählen:",
                 teilnehmer['teilnehmer_id'],
-                format_func=lambda x: teilnehmer[teilnehmer['teilnehmer_id'] == x]['name'].values[0]
+                format_func=lambda x: teilnehmer[teilnehmer['teilnehmer_id'] == x]['name'].values[0],
+                key="edit_test_teilnehmer"
             )
 
-            df_tests = get_tests_by_teilnehmer(selected_id)
+            df_tests = data.tests(selected_id)
             if df_tests.empty:
                 st.info("Keine Tests verfügbar.")
             else:
                 selected_test_id = st.selectbox("Test auswählen:", df_tests['test_id'])
                 if st.button("Test löschen"):
                     delete_test(selected_test_id)
+                    data.invalidate()
                     st.success("Test erfolgreich gelöscht.")
 
+    # Tab: Tests im Raster bearbeiten
+    with tabs[3]:
+        st.subheader("Mehrere Tests gleichzeitig bearbeiten")
+        teilnehmer = data.teilnehmer()
+
+        if teilnehmer.empty:
+            st.info("Keine Teilnehmer vorhanden.")
+        else:
+            bulk_edit_tests(data)
+
+def bulk_edit_tests(data):
+    """
+    Rasterbearbeitung der Tests eines Teilnehmers oder einer Kohorte (Berufsbezeichnung).
+    Beim Speichern werden nur die Unterschiede zur Ausgangstabelle ermittelt, vektorisiert geprüft,
+    die Gesamtwerte neu berechnet und alle Änderungen in einer Transaktion geschrieben.
+    Args:
+        data (PageData): Datenkontext der Seite.
+    """
+    teilnehmer = data.teilnehmer()
+    scope = st.radio("Bearbeiten für:", ["Teilnehmer", "Kohorte (Berufsbezeichnung)"], horizontal=True,
+                     key="bulk_scope")
+    if scope == "Teilnehmer":
+        selected_id = st.selectbox(
+            "Teilnehmer auswählen:",
+            teilnehmer['teilnehmer_id'],
+            format_func=dict(zip(teilnehmer['teilnehmer_id'], teilnehmer['name'])).get,
+            key="bulk_teilnehmer"
+        )
+        selected_id = int(selected_id)
+        df_tests = data.tests(selected_id)
+        teilnehmer_ids = [selected_id]
+        editor_key = f"bulk_editor_{selected_id}"
+    else:
+        beruf = st.selectbox("Berufsbezeichnung auswählen:", sorted(teilnehmer['berufsbezeichnung'].dropna().unique()),
+                             key="bulk_beruf")
+        df_tests = data.tests_by_beruf(beruf)
+        teilnehmer_ids = [int(x) for x in teilnehmer.loc[teilnehmer['berufsbezeichnung'] == beruf, 'teilnehmer_id']]
+        selected_id = teilnehmer_ids[0] if len(teilnehmer_ids) == 1 else None
+        editor_key = f"bulk_editor_beruf_{beruf}"
+
+    namen = dict(zip(teilnehmer['teilnehmer_id'].astype(int), teilnehmer['name']))
+    original = df_tests[['test_id', 'teilnehmer_id'] + TEST_VALUE_COLUMNS].sort_values('test_datum').reset_index(drop=True)
+    original = original.astype({'test_id': 'float64', 'teilnehmer_id': 'float64'})
+
+    edited = st.data_editor(
+        original,
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key=editor_key,
+        disabled=['test_id', 'gesamt_erreichte_punkte', 'gesamt_max_punkte', 'gesamt_prozent'],
+        column_config={
+            'test_id': st.column_config.NumberColumn("Test-ID", format="%d"),
+            'teilnehmer_id': st.column_config.SelectboxColumn(
+                "Teilnehmer", options=teilnehmer_ids, default=selected_id, required=True,
+                help=", ".join(f"{i} = {namen[i]}" for i in teilnehmer_ids)
+            ),
+            'test_datum': st.column_config.DateColumn("Testdatum", format="DD.MM.YYYY", required=True),
+            **{
+                f"{cat}_{art}_punkte": st.column_config.NumberColumn(
+                    f"{cat.capitalize()} ({'erreicht' if art == 'erreichte' else 'max.'})", min_value=0.0, step=0.5
+                )
+                for cat in KATEGORIEN for art in ("erreichte", "max")
+            },
+            'gesamt_prozent': st.column_config.NumberColumn("Gesamt (%)", format="%.2f"),
+        }
+    )
+
+    if st.button("Änderungen speichern", key="bulk_save"):
+        edited = edited.assign(test_datum=pd.to_datetime(edited['test_datum'], errors="coerce"))
+        if selected_id is not None:
+            edited['teilnehmer_id'] = edited['teilnehmer_id'].fillna(selected_id)
+        editable_columns = ['teilnehmer_id', 'test_datum'] + [
+            f"{cat}_{art}_punkte" for cat in KATEGORIEN for art in ("erreichte", "max")
+        ]
+        inserts, updates, deleted_ids = diff_test_frames(original, edited, editable_columns)
+        if inserts.empty and updates.empty and not deleted_ids:
+            st.info("Keine Änderungen vorhanden.")
+            return
+
+        changed = pd.concat([inserts, updates], ignore_index=True)
+        errors = validate_test_rows(changed, KATEGORIEN)
+        if (errors != "").any():
+            st.error("Einige Zeilen sind ungültig. Es wurde nichts gespeichert.")
+            st.dataframe(changed.assign(Fehler=errors)[errors != ""][['test_id', 'teilnehmer_id', 'test_datum', 'Fehler']],
+                         use_container_width=True)
+            return
+
+        try:
+            added, updated, deleted, flagged = apply_test_changes(
+                recalculate_totals(inserts, KATEGORIEN), recalculate_totals(updates, KATEGORIEN), deleted_ids
+            )
+            st.success(f"{added} Tests hinzugefügt, {updated} aktualisiert und {deleted} gelöscht.")
+            if flagged:
+                st.warning(f"{flagged} Tests wurden zur Prüfung vorgemerkt (siehe Prüfliste unter "
+                           f"'Automatische Berechnungen und Validierung').")
+        except Exception as e:
+            st.error(f"Fehler beim Speichern der Tests: {e}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,64 @@
+import logging
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from app.feature_store import FEATURE_NAMES
+
+# Mindestanzahl an Trainingsbeispielen für ein kohortenweites Modell
+MIN_TRAINING_ROWS = 10
+
+
+def training_data(store, target_percent):
+    """
+    Stellt die Trainingsdaten aus dem Feature-Store zusammen.
+    Merkmale sind die Werte vor dem jeweils letzten Test; Zielgröße ist, ob der letzte Test
+    den Zielwert verfehlt hat. Verwendet werden nur Teilnehmer mit mindestens zwei Tests.
+    Args:
+        store (dict): Arrays des Feature-Stores.
+        target_percent (float): Zielwert für 'gesamt_prozent'.
+    Returns:
+        tuple: (X, y) als numpy-Arrays.
+    """
+    previous = np.asarray(store["previous"])
+    last_total = np.asarray(store["last_total"])
+    mask = (previous[:, FEATURE_NAMES.index("anzahl_tests")] >= 1) & ~np.isnan(last_total)
+    return previous[mask], last_total[mask] < target_percent
+
+
+def train_risk_classifier(store, target_percent):
+    """
+    Trainiert einen kohortenweiten Klassifikator, der Teilnehmer mit Risiko erkennt,
+    den Zielwert zu verfehlen. Fehlende Merkmale (z. B. Steigung bei nur einem Test)
+    werden vom Modell nativ behandelt.
+    Args:
+        store (dict): Arrays des Feature-Stores.
+        target_percent (float): Zielwert für 'gesamt_prozent'.
+    Returns:
+        HistGradientBoostingClassifier: Das trainierte Modell.
+    """
+    X, y = training_data(store, target_percent)
+    if len(y) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Zu wenige Trainingsdaten: {len(y)} Teilnehmer mit mindestens zwei Tests "
+                         f"(benötigt: {MIN_TRAINING_ROWS}).")
+    if len(np.unique(y)) < 2:
+        raise ValueError("Die Trainingsdaten enthalten nur eine Klasse; alle Teilnehmer liegen "
+                         "über oder unter dem Zielwert.")
+    model = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, class_weight="balanced",
+                                           random_state=42)
+    model.fit(X, y)
+    logging.info(f"Risikomodell trainiert: {len(y)} Beispiele, {int(y.sum())} unter dem Zielwert.")
+    return model
+
+
+def score_cohort(model, store):
+    """
+    Bewertet alle Teilnehmer mit einem einzigen gebündelten Aufruf von `predict_proba`.
+    Args:
+        model (HistGradientBoostingClassifier): Trainiertes Modell.
+        store (dict): Arrays des Feature-Stores.
+    Returns:
+        pandas.DataFrame: 'teilnehmer_id' und 'risiko' (Wahrscheinlichkeit, den Zielwert zu verfehlen).
+    """
+    current = np.asarray(store["current"])
+    risk = model.predict_proba(current)[:, list(model.classes_).index(True)]
+    return pd.DataFrame({"teilnehmer_id": np.asarray(store["ids"]), "risiko": risk})
@@ -0,0 +1,240 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import pandas as pd
+import streamlit as st
+
+# Standorte und ihre Datenbanken. Weitere Standorte können über die Umgebungsvariable
+# NEW_MATH_SITES im Format "Name=pfad/zur/db.sqlite;Name2=..." ergänzt werden.
+DEFAULT_SITE = "Standard"
+SITES = {
+    DEFAULT_SITE: "file:streamlit_app.db?mode=memory&cache=shared",
+}
+SESSION_KEY = "standort"
+
+# Erlaubte Gruppierungsspalten für standortübergreifende Auswertungen
+FEDERATED_GROUP_COLUMNS = ["berufsbezeichnung", "geschlecht", "status"]
+
+# Pool lesender Verbindungen je Standort (für parallele Abfragen neben der gemeinsamen Schreibverbindung)
+READ_POOL_SIZE = 4
+READ_RETRY_ATTEMPTS = 5
+READ_RETRY_DELAY_SECONDS = 0.01
+_read_pools = {}
+# Anzahl der Wiederholungen gesperrter Lesevorgänge je Standort (z. B. für Lasttests)
+_read_retries = {}
+_read_retries_guard = threading.Lock()
+# Schreibsperre je Standort für die gemeinsame Schreibverbindung
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def _load_sites_from_env():
+    """
+    Ergänzt die Standortliste um die in NEW_MATH_SITES konfigurierten Standorte.
+    """
+    for entry in os.environ.get("NEW_MATH_SITES", "").split(";"):
+        if "=" in entry:
+            name, database = entry.split("=", 1)
+            SITES[name.strip()] = database.strip()
+
+
+_load_sites_from_env()
+
+
+def get_sites():
+    """
+    Gibt die Namen aller konfigurierten Standorte zurück.
+    """
+    return list(SITES.keys())
+
+
+def get_current_site():
+    """
+    Gibt den in der aktuellen Sitzung gewählten Standort zurück.
+    Außerhalb einer Sitzung (z. B. in Hintergrund-Threads) wird der Standardstandort verwendet.
+    """
+    try:
+        site = st.session_state.get(SESSION_KEY, DEFAULT_SITE)
+    except Exception:
+        site = DEFAULT_SITE
+    return site if site in SITES else DEFAULT_SITE
+
+
+def set_current_site(site):
+    """
+    Legt den Standort für die aktuelle Sitzung fest.
+    """
+    if site not in SITES:
+        raise ValueError(f"Unbekannter Standort: {site}")
+    st.session_state[SESSION_KEY] = site
+
+
+def site_slug(site):
+    """
+    Wandelt einen Standortnamen in einen für Dateipfade geeigneten Namen um.
+    """
+    return re.sub(r"[^\w-]", "_", site)
+
+
+def connect_site(site):
+    """
+    Öffnet eine neue Verbindung zur Datenbank eines Standorts.
+    Args:
+        site (str): Name des Standorts.
+    Returns:
+        sqlite3.Connection: Verbindung mit `check_same_thread=False`.
+    """
+    database = SITES[site]
+    try:
+        conn = sqlite3.connect(database, uri=database.startswith("file:"), check_same_thread=False)
+        logging.info(f"Datenbankverbindung für Standort '{site}' erfolgreich hergestellt.")
+        return conn
+    except sqlite3.Error as e:
+        logging.error(f"Fehler beim Herstellen der Datenbankverbindung für Standort '{site}': {e}")
+        raise e
+
+
+def write_lock(site):
+    """
+    Gibt die Schreibsperre eines Standorts zurück.
+    Alle Sitzungen und Threads teilen sich eine Schreibverbindung je Standort. Ein Commit oder Rollback
+    wirkt auf alle offenen Änderungen dieser Verbindung; jede Schreiboperation muss daher die Sperre
+    vom ersten Statement bis zum Commit bzw. Rollback halten.
+    Args:
+        site (str): Name des Standorts.
+    Returns:
+        threading.RLock: Sperre des Standorts (wiedereintrittsfähig).
+    """
+    with _write_locks_guard:
+        return _write_locks.setdefault(site, threading.RLock())
+
+
+@contextmanager
+def read_connection(site):
+    """
+    Leiht eine lesende Verbindung aus dem Pool des Standorts aus und gibt sie danach zurück.
+    Der Pool hält höchstens READ_POOL_SIZE Verbindungen; bei Bedarf werden zusätzliche
+    Verbindungen geöffnet und nach Gebrauch geschlossen.
+    Args:
+        site (str): Name des Standorts.
+    Yields:
+        sqlite3.Connection: Verbindung mit `PRAGMA query_only`.
+    """
+    pool = _read_pools.setdefault(site, queue.LifoQueue(maxsize=READ_POOL_SIZE))
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = connect_site(site)
+        conn.execute("PRAGMA query_only = 1")
+    try:
+        yield conn
+    finally:
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def read_with_retry(site, read):
+    """
+    Führt eine Leseoperation auf einer Pool-Verbindung aus. Ist eine Tabelle gerade durch eine
+    Schreibtransaktion gesperrt (Shared-Cache meldet das sofort statt zu warten), wird kurz gewartet
+    und erneut gelesen.
+    Args:
+        site (str): Name des Standorts.
+        read (callable): Erhält die Verbindung und gibt das Ergebnis zurück.
+    Returns:
+        Ergebnis von `read`.
+    """
+    for attempt in range(READ_RETRY_ATTEMPTS):
+        with read_connection(site) as conn:
+            try:
+                return read(conn)
+            except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+                if "locked" not in str(e) or attempt == READ_RETRY_ATTEMPTS - 1:
+                    raise e
+        with _read_retries_guard:
+            _read_retries[site] = _read_retries.get(site, 0) + 1
+        time.sleep(READ_RETRY_DELAY_SECONDS * (attempt + 1))
+
+
+def read_retry_count(site=None):
+    """
+    Gibt zurück, wie oft Lesevorgänge wegen einer gesperrten Tabelle wiederholt wurden.
+    Args:
+        site (str): Name des Standorts; ohne Angabe die Summe über alle Standorte.
+    Returns:
+        int: Anzahl der Wiederholungen seit Programmstart.
+    """
+    with _read_retries_guard:
+        return _read_retries.get(site, 0) if site else sum(_read_retries.values())
+
+
+def fan_out(query, params=(), sites=None):
+    """
+    Führt dieselbe Abfrage parallel auf allen Standorten aus.
+    Jeder Worker nutzt eine eigene, kurzlebige Leseverbindung.
+    Args:
+        query (str): SQL-Abfrage.
+        params (tuple): Abfrageparameter.
+        sites (list): Standorte; Standard sind alle konfigurierten Standorte.
+    Returns:
+        pandas.DataFrame: Zusammengeführte Teilergebnisse mit zusätzlicher Spalte 'standort'.
+    """
+    sites = sites or get_sites()
+
+    def run(site):
+        conn = connect_site(site)
+        try:
+            df = pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+        df.insert(0, "standort", site)
+        return df
+
+    with ThreadPoolExecutor(max_workers=min(len(sites), 8), thread_name_prefix="site-fan-out") as executor:
+        parts = list(executor.map(run, sites))
+    # Leere Teilergebnisse würden beim Zusammenführen numerische Spalten zu 'object' machen
+    return pd.concat([df for df in parts if not df.empty] or parts[:1], ignore_index=True)
+
+
+def federated_cohort_statistics(group_by="berufsbezeichnung", sites=None):
+    """
+    Berechnet standortübergreifende Kohortenstatistiken für 'gesamt_prozent'.
+    Jeder Standort liefert nur Teilaggregate (Anzahl, Summe, Minimum, Maximum) je Gruppe;
+    diese werden anschließend zusammengeführt, ohne Einzelzeilen zu übertragen.
+    Args:
+        group_by (str): Gruppierungsspalte aus FEDERATED_GROUP_COLUMNS.
+        sites (list): Standorte; Standard sind alle konfigurierten Standorte.
+    Returns:
+        pandas.DataFrame: Je Gruppe Anzahl Tests, Durchschnitt, Minimum, Maximum und Anzahl Standorte.
+    """
+    if group_by not in FEDERATED_GROUP_COLUMNS:
+        raise ValueError(f"Ungültige Gruppierungsspalte: {group_by}")
+
+    partials = fan_out(f'''
+        SELECT t.{group_by} AS gruppe,
+               COUNT(*) AS anzahl,
+               SUM(x.gesamt_prozent) AS summe,
+               MIN(x.gesamt_prozent) AS minimum,
+               MAX(x.gesamt_prozent) AS maximum
+        FROM tests x
+        JOIN teilnehmer t ON t.teilnehmer_id = x.teilnehmer_id
+        GROUP BY t.{group_by}
+    ''', sites=sites)
+
+    merged = partials.groupby("gruppe").agg(
+        anzahl=("anzahl", "sum"),
+        summe=("summe", "sum"),
+        minimum=("minimum", "min"),
+        maximum=("maximum", "max"),
+        standorte=("standort", "nunique"),
+    )
+    merged["durchschnitt"] = merged["summe"] / merged["anzahl"]
+    return merged.drop(columns="summe").reset_index().rename(columns={"gruppe": group_by})
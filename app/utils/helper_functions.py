@@ -113,3 +113,69 @@ def calculate_age(sv_nummer):
         return age
     except ValueError:
         return None
+
+def recalculate_totals(df, categories):
+    """
+    Berechnet Gesamtpunkte und Gesamtprozentsatz für alle Zeilen eines Test-DataFrames (vektorisiert).
+    Args:
+        df (pandas.DataFrame): Tests mit den Spalten '<kategorie>_erreichte_punkte' und '<kategorie>_max_punkte'.
+        categories (list): Namen der Kategorien.
+    Returns:
+        pandas.DataFrame: Kopie mit aktualisierten Spalten 'gesamt_erreichte_punkte', 'gesamt_max_punkte'
+        und 'gesamt_prozent'.
+    """
+    erreicht = df[[f"{c}_erreichte_punkte" for c in categories]].astype(float).sum(axis=1)
+    maximal = df[[f"{c}_max_punkte" for c in categories]].astype(float).sum(axis=1)
+    prozent = (erreicht / maximal.where(maximal > 0) * 100).fillna(0.0)
+    return df.assign(gesamt_erreichte_punkte=erreicht, gesamt_max_punkte=maximal, gesamt_prozent=prozent)
+
+def validate_test_rows(df, categories):
+    """
+    Überprüft alle Zeilen eines Test-DataFrames auf einmal (vektorisiert).
+    Geprüft wird: Teilnehmer und Testdatum vorhanden, alle Punkte vorhanden und nicht negativ,
+    erreichte Punkte nicht größer als die maximalen Punkte.
+    Args:
+        df (pandas.DataFrame): Zu prüfende Tests.
+        categories (list): Namen der Kategorien.
+    Returns:
+        pandas.Series: Fehlermeldung je Zeile (leerer String, wenn die Zeile gültig ist).
+    """
+    errors = pd.Series("", index=df.index, dtype=object)
+
+    def add_error(mask, message):
+        errors[mask] = errors[mask] + message + " "
+
+    add_error(df["teilnehmer_id"].isna(), "Teilnehmer fehlt.")
+    add_error(pd.to_datetime(df["test_datum"], errors="coerce").isna(), "Testdatum fehlt oder ist ungültig.")
+    for c in categories:
+        erreicht = pd.to_numeric(df[f"{c}_erreichte_punkte"], errors="coerce")
+        maximal = pd.to_numeric(df[f"{c}_max_punkte"], errors="coerce")
+        add_error(erreicht.isna() | maximal.isna(), f"{c.capitalize()}: Punkte fehlen.")
+        add_error((erreicht < 0) | (maximal < 0), f"{c.capitalize()}: Punkte dürfen nicht negativ sein.")
+        add_error(erreicht > maximal, f"{c.capitalize()}: Erreichte Punkte größer als maximale Punkte.")
+    return errors.str.strip()
+
+def diff_test_frames(original, edited, columns):
+    """
+    Ermittelt die Unterschiede zwischen den ursprünglichen und den bearbeiteten Tests.
+    Zeilen ohne 'test_id' sind neu, fehlende 'test_id's wurden gelöscht und Zeilen mit
+    mindestens einem geänderten Wert in `columns` wurden aktualisiert.
+    Args:
+        original (pandas.DataFrame): Tests vor der Bearbeitung (mit Spalte 'test_id').
+        edited (pandas.DataFrame): Tests nach der Bearbeitung, z. B. aus `st.data_editor`.
+        columns (list): Spalten, deren Änderung eine Aktualisierung auslöst.
+    Returns:
+        tuple: (inserts, updates, deleted_ids) – zwei DataFrames und eine Liste von Test-IDs.
+    """
+    inserts = edited[edited["test_id"].isna()]
+    kept = edited[edited["test_id"].notna()].astype({"test_id": "int64"}).set_index("test_id")
+    before = original.astype({"test_id": "int64"}).set_index("test_id")
+
+    deleted_ids = before.index.difference(kept.index).tolist()
+    common = kept.index.intersection(before.index)
+    old_values = before.loc[common, columns]
+    new_values = kept.loc[common, columns]
+    # Zeilenweiser Vergleich; zwei fehlende Werte gelten als gleich
+    changed = ((old_values != new_values) & ~(old_values.isna() & new_values.isna())).any(axis=1)
+    updates = kept.loc[common[changed.to_numpy()]].reset_index()
+    return inserts, updates, deleted_ids
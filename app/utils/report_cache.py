@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+# Standardwerte für den Bericht-Cache
+REPORT_CACHE_DIR = Path("report_cache")
+REPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+_eviction_lock = threading.Lock()
+
+
+def report_cache_key(participant, test_data, template_version, extra=None):
+    """
+    Berechnet einen inhaltsbasierten Schlüssel für einen Bericht.
+    Args:
+        participant (dict | pandas.Series): Teilnehmerdaten.
+        test_data (pandas.DataFrame): Testdaten, die in den Bericht einfließen.
+        template_version (str): Version der Berichtsvorlage; eine neue Version erzeugt neue Schlüssel.
+        extra (dict): Weitere Werte, die das Ergebnis beeinflussen (z. B. berechnetes Alter).
+    Returns:
+        str: SHA-256-Hexdigest.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(str(template_version).encode("utf-8"))
+    hasher.update(json.dumps({k: str(v) for k, v in dict(participant).items()}, sort_keys=True).encode("utf-8"))
+    hasher.update(json.dumps({k: str(v) for k, v in (extra or {}).items()}, sort_keys=True).encode("utf-8"))
+    hasher.update(test_data.to_csv(index=False).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def get_or_render(key, suffix, render, cache_dir=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+    """
+    Gibt einen Bericht aus dem Cache zurück oder erzeugt ihn und legt ihn im Cache ab.
+    Bei einem Treffer wird die Änderungszeit der Datei aktualisiert (LRU-Reihenfolge).
+    Args:
+        key (str): Inhaltsbasierter Schlüssel, siehe `report_cache_key`.
+        suffix (str): Dateiendung, z. B. '.pdf' oder '.xlsx'.
+        render (callable): Erzeugt den Bericht und gibt die Bytes zurück.
+        cache_dir (str | Path): Cache-Verzeichnis.
+        max_bytes (int): Maximale Gesamtgröße des Caches.
+    Returns:
+        bytes: Inhalt des Berichts.
+    """
+    cache_dir = Path(cache_dir)
+    path = cache_dir / f"{key}{suffix}"
+    try:
+        data = path.read_bytes()
+        os.utime(path)
+        logging.info(f"Bericht aus dem Cache geliefert: {path.name}")
+        return data
+    except FileNotFoundError:
+        pass
+
+    data = render()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        evict(cache_dir, max_bytes)
+    except OSError as e:
+        # Ein Fehler beim Cachen darf die Auslieferung des Berichts nicht verhindern
+        logging.error(f"Fehler beim Speichern des Berichts im Cache: {e}")
+    return data
+
+
+def evict(cache_dir=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+    """
+    Entfernt die am längsten nicht genutzten Berichte, bis der Cache höchstens `max_bytes` groß ist.
+    Args:
+        cache_dir (str | Path): Cache-Verzeichnis.
+        max_bytes (int): Maximale Gesamtgröße des Caches.
+    Returns:
+        int: Anzahl der entfernten Dateien.
+    """
+    with _eviction_lock:
+        entries = []
+        for path in Path(cache_dir).iterdir():
+            if path.name.endswith(".part"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if removed:
+            logging.info(f"{removed} Berichte aus dem Cache entfernt.")
+        return removed
@@ -0,0 +1 @@
+# Module
@@ -0,0 +1,87 @@
+# benchmarks/dedup_blocking.py
+#
+# Misst die Dublettenprüfung aus app/dedup.py auf einem Bestand mit 100.000 Teilnehmern,
+# von denen ein kleiner Anteil als Dublette mit Tippfehlern in Name oder SV-Nummer angelegt ist.
+# Verglichen wird nur innerhalb der Blöcke (Geburtsdatum, Namensteile), nicht jeder mit jedem.
+# Aufruf aus dem Projektverzeichnis: python -m benchmarks.dedup_blocking
+
+import random
+import sqlite3
+import time
+from app.change_journal import init_change_journal
+from app.dedup import find_duplicates, init_dedup_index
+
+ANZAHL_TEILNEHMER = 100_000
+ANTEIL_DUBLETTEN = 0.01
+VORNAMEN = ["Anna", "Hans", "Peter", "Maria", "Jürgen", "Sabine", "Lukas", "Fatma", "Mehmet", "Olga", "Jan", "Lea",
+            "Thomas", "Julia", "Stefan", "Sophie", "Ali", "Nina", "Paul", "Sara"]
+SILBEN = ["mül", "schm", "ler", "idt", "bau", "er", "ko", "walt", "berg", "mann", "hof", "stein", "ra", "lin",
+          "ger", "ber", "tz", "ski", "ova", "ic", "ke", "haus", "bach", "feld"]
+
+
+def _tippfehler(rng, text):
+    """
+    Vertauscht zwei benachbarte Zeichen oder ersetzt ein Zeichen.
+    """
+    i = rng.randrange(len(text) - 1)
+    if rng.random() < 0.5:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice("aeiourstn") + text[i + 1:]
+
+
+def seed_participants(conn, rows=ANZAHL_TEILNEHMER, duplicate_share=ANTEIL_DUBLETTEN, seed=7):
+    """
+    Legt Teilnehmer mit zufälligen Namen und SV-Nummern an und fügt Dubletten mit Tippfehlern hinzu.
+    Returns:
+        int: Anzahl der eingefügten Dubletten.
+    """
+    rng = random.Random(seed)
+    rows_data = []
+    for i in range(rows):
+        nachname = "".join(rng.choice(SILBEN) for _ in range(rng.randint(3, 4))).capitalize()
+        sv = f"{i % 10000:04d}{rng.randrange(1, 29):02d}{rng.randrange(1, 13):02d}{rng.randrange(100):02d}"
+        rows_data.append((f"{rng.choice(VORNAMEN)} {nachname}", sv, rng.choice(["Männlich", "Weiblich"])))
+    duplicates = []
+    for name, sv, geschlecht in rng.sample(rows_data, int(rows * duplicate_share)):
+        if rng.random() < 0.5:
+            name = _tippfehler(rng, name)
+        sv = _tippfehler(rng, sv[:4]) + sv[4:]
+        duplicates.append((name, sv, geschlecht))
+    conn.executemany('''
+        INSERT OR IGNORE INTO teilnehmer (name, sv_nummer, geschlecht, eintrittsdatum, berufsbezeichnung, status)
+        VALUES (?, ?, ?, '2024-01-01', 'Koch', 'Aktiv')
+    ''', rows_data + duplicates)
+    conn.commit()
+    return len(duplicates)
+
+
+def main():
+    conn = sqlite3.connect(":memory:")
+    conn.execute('''
+        CREATE TABLE teilnehmer (
+            teilnehmer_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, sv_nummer TEXT UNIQUE NOT NULL,
+            geschlecht TEXT NOT NULL, eintrittsdatum TEXT NOT NULL, austrittsdatum TEXT,
+            berufsbezeichnung TEXT NOT NULL, status TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE TABLE tests (test_id INTEGER PRIMARY KEY, teilnehmer_id INTEGER NOT NULL)")
+    conn.execute("CREATE INDEX idx_tests_teilnehmer_id ON tests (teilnehmer_id)")
+    init_change_journal(conn)
+    init_dedup_index(conn)
+    eingefuegt = seed_participants(conn)
+    total = conn.execute("SELECT COUNT(*) FROM teilnehmer").fetchone()[0]
+    print(f"{total} Teilnehmer, davon {eingefuegt} Dubletten mit Tippfehlern")
+
+    start = time.perf_counter()
+    result = find_duplicates(conn)
+    first_run = time.perf_counter() - start
+    print(f"Erste Prüfung (inkl. Aufbau der Blocking-Schlüssel): {first_run:.2f} s, {len(result)} Treffer")
+
+    start = time.perf_counter()
+    result = find_duplicates(conn)
+    print(f"Wiederholte Prüfung (Schlüssel aktuell): {time.perf_counter() - start:.2f} s, {len(result)} Treffer")
+    print(f"Paarweise ohne Blocking wären {total * (total - 1) // 2:,} Vergleiche nötig.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# benchmarks/load_test.py
+#
+# Lasttest für gleichzeitige Streamlit-Sitzungen.
+# Simuliert viele Sitzungen, die nacheinander alle Seiten aus `main.PAGES` aufrufen, und misst
+# die Rerun-Latenz (p50/p95/p99), die Wartezeit auf die Schreibsperre, die Wiederholungen gesperrter
+# Lesevorgänge sowie den Speicherbedarf je Sitzung. Der Speicher wird in einem eigenen Durchlauf mit
+# tracemalloc gemessen, da die Ablaufverfolgung jede Allokation verlangsamt und die Latenzen verfälschen
+# würde. Die Sitzungen laufen headless über den ScriptRunner von Streamlit, d. h. mit denselben Caches
+# (`st.cache_resource`) und demselben Session-State wie im Server.
+#
+# Aufruf aus dem Projektverzeichnis:
+#   python -m benchmarks.load_test --sessions 50 --rounds 2 --report load_test_report.json
+
+import argparse
+import json
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import MagicMock
+import numpy as np
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+from streamlit.runtime.scriptrunner import RerunData, ScriptRunner, ScriptRunnerEvent
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.state.session_state import SessionState
+
+MAIN_SCRIPT = str(Path(__file__).resolve().parent.parent / "main.py")
+RERUN_TIMEOUT_SECONDS = 120
+STOP_EVENTS = (
+    ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS,
+    ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+    ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN,
+)
+
+
+def install_runtime():
+    """
+    Installiert eine minimale Streamlit-Runtime, damit Caches und Medienablage wie im Server funktionieren.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+
+class SimulatedSession:
+    """
+    Eine simulierte Browsersitzung: eigener Session-State, ein ScriptRunner je Rerun
+    (wie in `AppSession`), gesammelte Fehler- und Ausnahmeelemente.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = f"loadtest-{session_id}"
+        self.session_state = SessionState()
+        self.script_cache = ScriptCache()
+        self.uploaded_file_mgr = MemoryUploadedFileManager("/mock/upload")
+        self.errors = []
+
+    def rerun(self, page, page_session_key):
+        """
+        Führt einen Rerun für die angegebene Seite aus und gibt die Dauer in Sekunden zurück.
+        """
+        self.session_state[page_session_key] = page
+        done = threading.Event()
+
+        def on_event(sender, event, forward_msg=None, **kwargs):
+            if event == ScriptRunnerEvent.ENQUEUE_FORWARD_MSG and forward_msg is not None:
+                self._collect_errors(page, forward_msg)
+            elif event in STOP_EVENTS:
+                done.set()
+
+        runner = ScriptRunner(
+            session_id=self.session_id,
+            main_script_path=MAIN_SCRIPT,
+            session_state=self.session_state,
+            uploaded_file_mgr=self.uploaded_file_mgr,
+            script_cache=self.script_cache,
+            initial_rerun_data=RerunData(),
+            user_info={"email": f"{self.session_id}@example.com"},
+        )
+        runner.on_event.connect(on_event, weak=False)
+
+        start = time.perf_counter()
+        runner.start()
+        if not done.wait(RERUN_TIMEOUT_SECONDS):
+            runner.request_stop()
+            self.errors.append((page, f"Zeitüberschreitung nach {RERUN_TIMEOUT_SECONDS} s"))
+        duration = time.perf_counter() - start
+        runner._script_thread.join()
+        return duration
+
+    def _collect_errors(self, page, forward_msg):
+        element = forward_msg.delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.errors.append((page, element.exception.message))
+        elif kind == "alert" and element.alert.format == Alert.ERROR:
+            self.errors.append((page, element.alert.body))
+
+
+class TimedLock:
+    """
+    Ersetzt die Schreibsperre eines Standorts und misst, wie lange Schreiber auf sie warten.
+    Gemessen wird nur das äußerste Betreten; wiedereintretende Aufrufe desselben Threads warten nie.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = threading.local()
+        self.waits = []
+
+    def __enter__(self):
+        depth = getattr(self._depth, "value", 0)
+        start = time.perf_counter()
+        self._lock.acquire()
+        if depth == 0:
+            self.waits.append(time.perf_counter() - start)
+        self._depth.value = depth + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth.value -= 1
+        self._lock.release()
+
+
+def percentiles_ms(samples):
+    """
+    Gibt p50/p95/p99/max einer Liste von Sekundenwerten in Millisekunden zurück.
+    """
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "n": 0}
+    values = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2),
+            "max": round(values.max(), 2), "n": len(values)}
+
+
+def drive_sessions(simulated, page_names, page_session_key, rounds):
+    """
+    Lässt alle Sitzungen gleichzeitig die Seiten durchklicken.
+    Returns:
+        tuple: (Latenzen je Seite in Sekunden, Laufzeit in Sekunden)
+    """
+    latencies = {page: [] for page in page_names}
+
+    def drive(session, offset):
+        # Jede Sitzung beginnt auf einer anderen Seite, damit alle Seiten gleichzeitig Last erzeugen
+        for _ in range(rounds):
+            for i in range(len(page_names)):
+                page = page_names[(offset + i) % len(page_names)]
+                latencies[page].append(session.rerun(page, page_session_key))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=drive, args=(s, i), name=s.session_id) for i, s in enumerate(simulated)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def run_load_test(sessions, rounds, teilnehmer, tests, measure_memory=True):
+    """
+    Führt den Lasttest aus: zuerst den Latenzdurchlauf ohne Speichermessung, danach optional
+    einen Speicherdurchlauf (eine Runde je Sitzung mit neuen Sitzungen) unter tracemalloc.
+    Args:
+        sessions (int): Anzahl gleichzeitiger Sitzungen.
+        rounds (int): Wie oft jede Sitzung alle Seiten durchklickt.
+        teilnehmer (int): Anzahl der Teilnehmer in der Testdatenbank.
+        tests (int): Anzahl der Tests in der Testdatenbank.
+        measure_memory (bool): Speicherdurchlauf ausführen.
+    Returns:
+        dict: Bericht mit Latenzen, Sperrwartezeiten, Lesewiederholungen, Speicher und Fehlern.
+    """
+    install_runtime()
+    # Erst nach der Runtime importieren, damit `st.cache_resource` wie im Server cached
+    from main import PAGES, PAGE_SESSION_KEY
+    from app import site_router
+    from app.db_manager import get_db_connection
+    from benchmarks.typed_reads_memory import seed_rows
+
+    # Schreibsperren vor der ersten Verwendung durch messende Sperren ersetzen
+    timed_locks = {site: TimedLock() for site in site_router.get_sites()}
+    site_router._write_locks.update(timed_locks)
+
+    conn = get_db_connection()
+    seed_rows(conn, teilnehmer, tests)
+    page_names = list(PAGES.keys())
+
+    # Aufwärmen: Module, Caches und Verbindung initialisieren, damit nur der Dauerbetrieb gemessen wird
+    SimulatedSession("warmup").rerun(page_names[0], PAGE_SESSION_KEY)
+    for lock in timed_locks.values():
+        lock.waits.clear()
+    retries_before = site_router.read_retry_count()
+
+    simulated = [SimulatedSession(i) for i in range(sessions)]
+    latencies, wall_time = drive_sessions(simulated, page_names, PAGE_SESSION_KEY, rounds)
+    lock_waits = [wait for lock in timed_locks.values() for wait in lock.waits]
+    read_retries = site_router.read_retry_count() - retries_before
+
+    memory = None
+    if measure_memory:
+        tracemalloc.start()
+        memory_baseline = tracemalloc.get_traced_memory()[0]
+        memory_sessions = [SimulatedSession(f"memory-{i}") for i in range(sessions)]
+        drive_sessions(memory_sessions, page_names, PAGE_SESSION_KEY, 1)
+        memory_current, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        simulated += memory_sessions
+        memory = {
+            "je_sitzung": round((memory_current - memory_baseline) / sessions / 1024 ** 2, 3),
+            "spitze_gesamt": round((memory_peak - memory_baseline) / 1024 ** 2, 2),
+        }
+
+    return {
+        "konfiguration": {"sitzungen": sessions, "runden": rounds, "teilnehmer": teilnehmer, "tests": tests,
+                          "seiten": page_names},
+        "laufzeit_s": round(wall_time, 2),
+        "reruns": sum(len(v) for v in latencies.values()),
+        "rerun_latenz_ms": {
+            "gesamt": percentiles_ms([d for v in latencies.values() for d in v]),
+            **{page: percentiles_ms(v) for page, v in latencies.items()},
+        },
+        "schreibsperre_wartezeit_ms": percentiles_ms(lock_waits),
+        "lesewiederholungen": read_retries,
+        "speicher_mb": memory,
+        "fehler": [
+            {"sitzung": s.session_id, "seite": page, "meldung": message}
+            for s in simulated for page, message in s.errors
+        ],
+    }
+
+
+def print_summary(report):
+    """
+    Gibt eine kurze Zusammenfassung des Berichts aus.
+    """
+    print(f"{report['reruns']} Reruns in {report['laufzeit_s']} s "
+          f"({report['konfiguration']['sitzungen']} Sitzungen)")
+    print(f"{'Seite':<45}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for page, stats in report["rerun_latenz_ms"].items():
+        print(f"{page:<45}{stats['p50']:>9}{stats['p95']:>9}{stats['p99']:>9}")
+    wait = report["schreibsperre_wartezeit_ms"]
+    print(f"Schreibsperre: {wait['n']} Zugriffe, Wartezeit p50 {wait['p50']} ms, p95 {wait['p95']} ms, "
+          f"p99 {wait['p99']} ms, max {wait['max']} ms")
+    print(f"Wiederholte Lesevorgänge (Tabelle gesperrt): {report['lesewiederholungen']}")
+    if report["speicher_mb"] is not None:
+        print(f"Speicher je Sitzung: {report['speicher_mb']['je_sitzung']} MB, "
+              f"Spitze gesamt: {report['speicher_mb']['spitze_gesamt']} MB (eigener Durchlauf)")
+    print(f"Fehler: {len(report['fehler'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest für gleichzeitige Streamlit-Sitzungen.")
+    parser.add_argument("--sessions", type=int, default=50, help="Anzahl gleichzeitiger Sitzungen")
+    parser.add_argument("--rounds", type=int, default=1, help="Durchläufe über alle Seiten je Sitzung")
+    parser.add_argument("--teilnehmer", type=int, default=500, help="Teilnehmer in der Testdatenbank")
+    parser.add_argument("--tests", type=int, default=5000, help="Tests in der Testdatenbank")
+    parser.add_argument("--report", default="load_test_report.json", help="Pfad des JSON-Berichts")
+    parser.add_argument("--no-memory", action="store_true", help="Speicherdurchlauf überspringen")
+    args = parser.parse_args()
+
+    report = run_load_test(args.sessions, args.rounds, args.teilnehmer, args.tests,
+                           measure_memory=not args.no_memory)
+    Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print_summary(report)
+    print(f"Bericht gespeichert: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
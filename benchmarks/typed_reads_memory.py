@@ -0,0 +1,107 @@
+# benchmarks/typed_reads_memory.py
+#
+# Vergleicht den Speicherbedarf der ungetypten Abfrage (`SELECT *` über pd.read_sql_query)
+# mit der getypten Leseschicht aus app/db_schema.py auf einem Datensatz mit 100.000 Zeilen.
+# Aufruf aus dem Projektverzeichnis: python -m benchmarks.typed_reads_memory
+
+import sqlite3
+import random
+from datetime import date, timedelta
+import pandas as pd
+from app.db_schema import read_typed, KATEGORIEN
+
+ANZAHL_ZEILEN = 100_000
+BERUFE = ["Bürokaufmann", "Elektriker", "Tischler", "Koch", "Maler", "Installateur", "Friseur", "Mechatroniker"]
+
+
+def seed_database(conn, rows=ANZAHL_ZEILEN):
+    """
+    Legt die Tabellen 'teilnehmer' und 'tests' an und befüllt sie mit Zufallsdaten.
+    Args:
+        conn (sqlite3.Connection): Leere Datenbankverbindung.
+        rows (int): Anzahl der Zeilen je Tabelle.
+    """
+    punkte_spalten = [f"{k}_{art}_punkte" for k in KATEGORIEN for art in ("erreichte", "max")]
+    conn.execute('''
+        CREATE TABLE teilnehmer (
+            teilnehmer_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, sv_nummer TEXT UNIQUE NOT NULL,
+            geschlecht TEXT NOT NULL, eintrittsdatum TEXT NOT NULL, austrittsdatum TEXT,
+            berufsbezeichnung TEXT NOT NULL, status TEXT NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE tests (
+            test_id INTEGER PRIMARY KEY AUTOINCREMENT, teilnehmer_id INTEGER NOT NULL, test_datum TEXT NOT NULL,
+            {", ".join(f"{s} REAL NOT NULL" for s in punkte_spalten)},
+            gesamt_erreichte_punkte REAL NOT NULL, gesamt_max_punkte REAL NOT NULL, gesamt_prozent REAL NOT NULL
+        )
+    ''')
+    seed_rows(conn, rows, rows)
+
+
+def seed_rows(conn, teilnehmer_rows, test_rows, seed=42):
+    """
+    Befüllt bestehende Tabellen 'teilnehmer' und 'tests' mit reproduzierbaren Zufallsdaten.
+    Args:
+        conn (sqlite3.Connection): Datenbankverbindung mit angelegtem Schema.
+        teilnehmer_rows (int): Anzahl der Teilnehmer.
+        test_rows (int): Anzahl der Tests (zufällig auf die Teilnehmer verteilt).
+        seed (int): Startwert des Zufallsgenerators.
+    """
+    rng = random.Random(seed)
+    punkte_spalten = [f"{k}_{art}_punkte" for k in KATEGORIEN for art in ("erreichte", "max")]
+    start = date(2020, 1, 1)
+    teilnehmer = []
+    for i in range(teilnehmer_rows):
+        eintritt = start + timedelta(days=rng.randrange(1500))
+        austritt = eintritt + timedelta(days=rng.randrange(30, 400)) if rng.random() < 0.4 else None
+        teilnehmer.append((
+            f"Teilnehmer {i}", f"{i:04d}{rng.randrange(1, 29):02d}{rng.randrange(1, 13):02d}{rng.randrange(100):02d}"[-10:],
+            rng.choice(["Männlich", "Weiblich", "Divers"]), eintritt.isoformat(),
+            austritt.isoformat() if austritt else None, rng.choice(BERUFE),
+            "Inaktiv" if austritt else "Aktiv"
+        ))
+    conn.executemany('''
+        INSERT OR IGNORE INTO teilnehmer (name, sv_nummer, geschlecht, eintrittsdatum, austrittsdatum, berufsbezeichnung, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', teilnehmer)
+    first_id, last_id = conn.execute("SELECT MIN(teilnehmer_id), MAX(teilnehmer_id) FROM teilnehmer").fetchone()
+    tests = []
+    for i in range(test_rows):
+        punkte = []
+        for _ in KATEGORIEN:
+            maximum = float(rng.choice([10, 20, 25]))
+            punkte += [round(rng.uniform(0, maximum), 1), maximum]
+        erreicht, maximal = sum(punkte[0::2]), sum(punkte[1::2])
+        tests.append((rng.randint(first_id, last_id), (start + timedelta(days=rng.randrange(1800))).isoformat(),
+                      *punkte, erreicht, maximal, erreicht / maximal * 100))
+    conn.executemany(f'''
+        INSERT INTO tests (teilnehmer_id, test_datum, {", ".join(punkte_spalten)},
+                           gesamt_erreichte_punkte, gesamt_max_punkte, gesamt_prozent)
+        VALUES ({", ".join("?" * (len(punkte_spalten) + 5))})
+    ''', tests)
+    conn.commit()
+
+
+def memory_mb(df):
+    """
+    Gibt den tatsächlichen Speicherbedarf eines DataFrames in MB zurück (inkl. Python-Objekte).
+    """
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main():
+    conn = sqlite3.connect(":memory:")
+    seed_database(conn)
+    print(f"{'Tabelle':<12}{'Zeilen':>10}{'ungetypt (MB)':>16}{'getypt (MB)':>14}{'Faktor':>9}")
+    for table in ("teilnehmer", "tests"):
+        query = f"SELECT * FROM {table}"
+        raw = pd.read_sql_query(query, conn)
+        typed = read_typed(conn, table, query)
+        vorher, nachher = memory_mb(raw), memory_mb(typed)
+        print(f"{table:<12}{len(raw):>10}{vorher:>16.2f}{nachher:>14.2f}{vorher / nachher:>8.1f}x")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
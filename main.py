@@ -7,6 +7,22 @@ from app.pages.calculations import main as calculations_main
 from app.pages.visualization import main as visualization_main
 from app.pages.reports import main as reports_main
 from app.pages.prediction import main as prediction_main
+from app.pages.admin import main as admin_main
+from app.db_manager import start_backup_schedule
+from app.site_router import get_sites, SESSION_KEY
+
+# Definition der verfügbaren Seiten und Zuordnung ihrer Hauptfunktionen
+PAGES = {
+    "Teilnehmerverwaltung": participants_main,
+    "Testdateneingabe und -verwaltung": tests_main,
+    "Automatische Berechnungen und Validierung": calculations_main,
+    "Datenvisualisierung": visualization_main,
+    "Berichterstellung": reports_main,
+    "KI-Prognose": prediction_main,
+    "Administration": admin_main
+}
+# Session-State-Schlüssel der Seitenauswahl
+PAGE_SESSION_KEY = "seite"
 
 
 def main():
@@ -23,6 +39,9 @@ def main():
         initial_sidebar_state="expanded"
     )
 
+    # Geplante Online-Sicherungen (einmal pro Prozess)
+    start_backup_schedule()
+
     # Titel und Begrüßungstext der Anwendung
     st.title("Teilnehmer- und Testmanagement System")
     st.markdown("""
@@ -35,26 +54,21 @@ def main():
     st.sidebar.title("Navigation")
     st.sidebar.info("Wählen Sie eine Seite, um fortzufahren.")
 
-    # Definition der verfügbaren Seiten und Zuordnung ihrer Hauptfunktionen
-    pages = {
-        "Teilnehmerverwaltung": participants_main,
-        "Testdateneingabe und -verwaltung": tests_main,
-        "Automatische Berechnungen und Validierung": calculations_main,
-        "Datenvisualisierung": visualization_main,
-        "Berichterstellung": reports_main,
-        "KI-Prognose": prediction_main
-    }
+    # Standortauswahl (jede Sitzung arbeitet mit der Datenbank ihres Standorts)
+    if len(get_sites()) > 1:
+        st.sidebar.selectbox("Standort auswählen", options=get_sites(), key=SESSION_KEY)
 
     # Auswahl einer Seite durch den Benutzer
     selection = st.sidebar.selectbox(
         "Seite auswählen",
-        options=list(pages.keys()),
-        index=0  # Standardmäßig ist die erste Seite ausgewählt
+        options=list(PAGES.keys()),
+        index=0,  # Standardmäßig ist die erste Seite ausgewählt
+        key=PAGE_SESSION_KEY
     )
 
     # Aufruf der Hauptfunktion der ausgewählten Seite
     if selection:
-        page_function = pages[selection]
+        page_function = PAGES[selection]
         try:
             page_function()
         except Exception as e: